@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from hybrid import tokenize
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "256"))
+
+
+def identifiers(question):
+    """Terms of a question holding a digit (part numbers, clause IDs, values): near-identical
+    questions about A-123 and A-124 embed almost the same, but have different answers"""
+    return frozenset(token for token in tokenize(question) if any(c.isdigit() for c in token))
+
+
+class CachedAnswer:
+    def __init__(self, question, vector, answer, sources):
+        self.question = question
+        self.identifiers = identifiers(question)
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.created_at = time.time()
+
+
+class SemanticAnswerCache:
+    """Answers to previous questions, per index, matched by question-embedding similarity.
+
+    A question whose embedding has a cosine similarity of at least threshold with a
+    cached question, and that names the same identifiers and numbers, gets that answer
+    back. Each scope (one document index, chat model and retrieval settings) keeps at
+    most max_entries answers, evicting the least recently used, and answers expire after
+    ttl seconds.
+    """
+
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL,
+                 max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._scopes = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, scope, question, vector):
+        """Return the closest CachedAnswer above the threshold with the same identifiers, or None"""
+        query = self._normalize(vector)
+        wanted = identifiers(question)
+        now = time.time()
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries:
+                for entry_id in [i for i, e in entries.items() if now - e.created_at > self.ttl]:
+                    del entries[entry_id]
+            entry_ids = [i for i, e in (entries or {}).items() if e.identifiers == wanted]
+            if not entry_ids:
+                self.misses += 1
+                return None
+
+            scores = np.stack([entries[i].vector for i in entry_ids]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            entries.move_to_end(entry_ids[best])
+            self.hits += 1
+            return entries[entry_ids[best]]
+
+    def store(self, scope, question, vector, answer, sources):
+        with self._lock:
+            entries = self._scopes.setdefault(scope, OrderedDict())
+            entries[question] = CachedAnswer(question, self._normalize(vector), answer, sources)
+            entries.move_to_end(question)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def invalidate(self, index_key=None):
+        """Drop the answers of one index (every model), or of all indexes"""
+        with self._lock:
+            if index_key is None:
+                self._scopes.clear()
+            else:
+                for scope in [s for s in self._scopes if s[0] == index_key]:
+                    del self._scopes[scope]
+
+    def invalidate_superseded(self, prefix, current_prefix):
+        """Drop the answers of the indexes whose key starts with prefix but not with current_prefix
+        (e.g. the corpus versions before the current one)"""
+        with self._lock:
+            for scope in [s for s in self._scopes if s[0].startswith(prefix) and not s[0].startswith(current_prefix)]:
+                del self._scopes[scope]
@@ -1,41 +1,152 @@
 import os
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_community.embeddings import OllamaEmbeddings
+import asyncio
+import hashlib
+import json
+import re
+import shutil
+import itertools
+import threading
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.chat_models import ChatOllama
-from langchain_core.runnables import RunnablePassthrough
-from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+from langchain_core.runnables import RunnableLambda, RunnableParallel, RunnablePassthrough
+from langchain_core.documents import Document
 import time
+from embeddings import CachedBatchEmbeddings
+from summary_cache import SummaryCache, text_hash
+from index_versions import IndexVersions
+from page_summaries import PAGE_SUMMARY_PREFILL, PREFILL_BATCH_PAGES, PageSummaryIndex
+from registry import resources
+import metrics
+import startup
+from scheduler import BATCH, ScheduledEmbeddings, ScheduledRunnable, priority
+from answer_cache import SemanticAnswerCache
+from corpus import Corpus
+from hybrid import BM25Index, HybridRetriever
+from compact_index import COMPACT_FORMATS, VECTOR_FORMAT, CompactVectorStore, compact_directory
+from summary_tree import build_outline, merge_groups, render_markdown
+from context_packing import (
+    CONTEXT_TOKEN_BUDGET, CONTEXT_TRIM_SENTENCES, chunk_tokens, context_budget, estimate_tokens, pack_context,
+)
+from pdf_loader import extract_page_texts, file_sha256, iter_pages, iter_windows, load_pages, page_count
+from layout_chunker import CHUNKER, LayoutChunker
 
-# Function to push metrics to Pushgateway
-def push_metrics(requests, time_taken, avg_len):
-    registry = CollectorRegistry()
-    request_count = Gauge('rag_request_count', 'Number of processed PDF summaries', registry=registry)
-    processing_time = Gauge('rag_processing_seconds', 'Processing time for the last request', registry=registry)
-    summary_length = Gauge('rag_summary_length', 'Average summary length', registry=registry)
+EMBEDDING_MODEL = "znbang/bge:small-en-v1.5-q8_0"
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+CHUNK_SIZE = 7500
+CHUNK_OVERLAP = 100
+# Summarization chunks of the "recursive" chunker
+SUMMARY_CHUNK_SIZE = 2000
 
-    request_count.set(requests)
-    processing_time.set(time_taken)
-    summary_length.set(avg_len)
+# On-disk vector indexes, one directory per (document content, chunking, embedding) key
+CACHE_DIR = os.getenv("RAG_CACHE_DIR", ".rag_cache")
+INDEX_DIR = os.path.join(CACHE_DIR, "index")
+EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite3")
+INDEX_READY_MARKER = ".complete"
+INDEX_FORMAT_VERSION = "1"
+# Keyword index saved next to each vector index, fused with it in "hybrid" retrieval mode
+BM25_FILENAME = "bm25.json"
+# Retrieval chunks of the layout chunker, saved next to each vector index for summarization
+CHUNKS_FILENAME = "chunks.jsonl"
+INDEX_VERSIONS_PATH = os.path.join(INDEX_DIR, "versions.sqlite3")
+# Rows deleted per call when a revision drops chunks of the previous version (Chroma caps batch sizes)
+STALE_DELETE_BATCH = 1000
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+# Shared multi-document store (corpus mode)
+CORPUS_DIR = os.path.join(CACHE_DIR, "corpus")
+INGEST_WINDOW_PAGES = int(os.getenv("RAG_INGEST_WINDOW_PAGES", "32"))
+# Uploaded PDFs, named by content hash, and the summaries of background jobs
+UPLOAD_DIR = os.path.join(CACHE_DIR, "uploads")
+SUMMARY_DIR = os.path.join(CACHE_DIR, "summaries")
 
-    raw_gateway = os.getenv("PUSHGATEWAY_URL", "http://localhost:9091")
-    gateway = raw_gateway.replace("http://", "").replace("https://", "")
+SUMMARY_CACHE_PATH = os.path.join(CACHE_DIR, "summaries.sqlite3")
+PAGE_SUMMARY_INDEX_PATH = os.path.join(CACHE_DIR, "page_summaries.sqlite3")
+SUMMARY_CONCURRENCY = int(os.getenv("RAG_SUMMARY_CONCURRENCY", "4"))
+SUMMARY_OUTPUT_PATH = "summaries.txt"
+# Next to the output, summaries already generated by summarize_sections, used to resume after a crash
+SUMMARY_PROGRESS_SUFFIX = ".progress"
 
-    try:
-        push_to_gateway(gateway, job='localrag_app', registry=registry)
-        print("✅ Metrics pushed successfully to Pushgateway.")
-    except Exception as e:
-        print(f"⚠️ Could not push metrics: {e}")
+SUMMARY_PROMPT = (
+    "Voici un extrait d'un document :\n\n{content}\n\nFais un résumé clair, simple à comprendre et concis. "
+    "Formate la sortie comme une liste Markdown propre, avec des puces de premier niveau uniquement (pas de puces imbriquées)."
+)
+# Fusion des résumés des parties d'une section (summarize_hierarchy)
+MERGE_PROMPT = (
+    "Voici les résumés successifs des parties de « {title} » :\n\n{content}\n\n"
+    "Fusionne-les en un seul résumé clair et concis de « {title} », sans répétitions. "
+    "Formate la sortie comme une liste Markdown propre, avec des puces de premier niveau uniquement (pas de puces imbriquées)."
+)
+
+def _until_stopped(chain, stopped):
+    """chain failing at once when stopped is set, so an abandoned batch drains without calling the model"""
+    def check(value):
+        if stopped.is_set():
+            raise RuntimeError("batch stopped")
+        return value
+    return RunnableLambda(check) | chain
+
+
+def _source_file(documents):
+    """The PDF the page Documents were loaded from, if they all come from one that still exists"""
+    paths = {doc.metadata.get("file_path") for doc in documents}
+    path = paths.pop() if len(paths) == 1 else None
+    return path if path and os.path.isfile(path) else None
+
+
+class AnswerRecorder:
+    """Collects the sources, answer text and latency stats of a streamed answer"""
+
+    def __init__(self, start_time):
+        self.start_time = start_time
+        self.sources = []
+        self.answer = ""
+        self.stats = {"cached": False}
+
+    def observe(self, chunk):
+        if "context" in chunk:
+            self.sources = chunk["context"]
+            self.stats["time_to_sources_s"] = time.time() - self.start_time
+        if "packed" in chunk:
+            self.stats.update(chunk["packed"]["stats"])
+        if "answer" in chunk:
+            if not self.answer:
+                self.stats["time_to_first_token_s"] = time.time() - self.start_time
+                metrics.observe("time_to_first_token", self.stats["time_to_first_token_s"])
+            self.answer += chunk["answer"]
 
 
 class LocalRAGApp:
     def __init__(self):
         self.vector_db = None
         self.chain = None
+        self.partial_index = False  # self.chain searches an index still being ingested
         self.local_model = "deepseek-r1:1.5b"
+        self.embedding_model = EMBEDDING_MODEL
+        self.chunk_size = CHUNK_SIZE
+        self.chunk_overlap = CHUNK_OVERLAP
+        self.chunker = CHUNKER
+        self.layout_chunker = LayoutChunker()
+        self.document_hash = None
+        self.embeddings = None
+        self.current_index_key = None
+        self.corpus = None
+        self.corpus_scope = {}
+        self.retrieval_mode = RETRIEVAL_MODE
+        self.vector_format = VECTOR_FORMAT
+        self.context_tokens = CONTEXT_TOKEN_BUDGET  # 0: derived from the chunk size, see context_budget()
+        self.context_trim = CONTEXT_TRIM_SENTENCES
+        self.last_query_stats = {}
+        self.ingest_window_pages = INGEST_WINDOW_PAGES
+        self.summary_concurrency = SUMMARY_CONCURRENCY
+        self.summary_cache = resources.get("summary_cache", SUMMARY_CACHE_PATH, lambda: SummaryCache(SUMMARY_CACHE_PATH))
+        self.answer_cache = resources.get("answer_cache", "default", SemanticAnswerCache)
+        self.page_summaries = resources.get(
+            "page_summaries", PAGE_SUMMARY_INDEX_PATH, lambda: PageSummaryIndex(PAGE_SUMMARY_INDEX_PATH)
+        )
+
+    def start_warm_up(self):
+        """Import the modules deferred at startup and load the models into Ollama, in the background"""
+        return startup.start_warm_up(OLLAMA_BASE_URL, self.local_model, self.embedding_model)
 
     def install_dependencies(self):
         """Install required dependencies"""
@@ -53,31 +164,383 @@ class LocalRAGApp:
     def load_document(self, file_path):
         """Load and process PDF document"""
         print(f"Loading document: {file_path}")
-        loader = PyMuPDFLoader(file_path)
-        data = loader.load()
+        with metrics.timed("load"):
+            data = load_pages(file_path)
+        self.document_hash = file_sha256(file_path)
         print(f"Document loaded successfully. Pages: {len(data)}")
         return data
 
-    def create_vector_db(self, data):
-        """Create vector database from document chunks"""
-        print("Creating vector database")
+    def index_key(self, data=None, doc_hash=None):
+        """Key identifying the vector index for the current document (or doc_hash) and chunking/embedding config"""
+        doc_hash = doc_hash or self.document_hash
+        if doc_hash is None:
+            # Documents not loaded from a file: fall back to hashing their text
+            digest = hashlib.sha256()
+            for doc in data or []:
+                digest.update(doc.page_content.encode("utf-8"))
+                digest.update(b"\0")
+            doc_hash = digest.hexdigest()
+
+        config = "|".join([doc_hash, self.index_config()])
+        return hashlib.sha256(config.encode("utf-8")).hexdigest()[:32]
+
+    def index_config(self):
+        """Settings an index depends on besides the document"""
+        if self.chunker == "layout":
+            return "|".join([self.embedding_model, self.layout_chunker.config(), INDEX_FORMAT_VERSION])
+        return "|".join([self.embedding_model, str(self.chunk_size), str(self.chunk_overlap), INDEX_FORMAT_VERSION])
+
+    def retrieval_chunk_chars(self):
+        """Largest retrieval chunk of the active chunker, in characters"""
+        if self.chunker == "layout":
+            return self.layout_chunker.paragraph_chars
+        return self.chunk_size
+
+    def context_budget(self):
+        """Token budget of the prompt context: RAG_CONTEXT_TOKENS, else derived from the chunk size"""
+        return context_budget(self.retrieval_chunk_chars(), self.context_tokens)
+
+    def get_index_versions(self):
+        return resources.get("index_versions", INDEX_VERSIONS_PATH, lambda: IndexVersions(INDEX_VERSIONS_PATH))
+
+    def _previous_version(self, lineage, key):
+        """Index key of the latest complete version of lineage built with the current settings"""
+        for version in reversed(self.get_index_versions().versions(lineage)):
+            if (version["index_key"] != key and version["config"] == self.index_config()
+                    and os.path.exists(os.path.join(INDEX_DIR, version["index_key"], INDEX_READY_MARKER))):
+                return version["index_key"]
+        return None
+
+    def get_embeddings(self):
+        """Embedding function shared by indexing and retrieval (batched, concurrent, cached)"""
+        if self.embeddings is None:
+            # The Ollama clients and Chroma are imported on first use, off the startup path (see startup.py)
+            from langchain_community.embeddings import OllamaEmbeddings
+
+            self.embeddings = resources.get("embeddings", self.embedding_model, lambda: CachedBatchEmbeddings(
+                ScheduledEmbeddings(OllamaEmbeddings(model=self.embedding_model, base_url=OLLAMA_BASE_URL, show_progress=False), self.embedding_model),
+                model=self.embedding_model,
+                cache_path=EMBEDDING_CACHE_PATH,
+            ))
+        return self.embeddings
 
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=7500, chunk_overlap=100)
-        chunks = text_splitter.split_documents(data)
+    def get_llm(self):
+        """Chat model client, shared by every session of the process; calls go through the scheduler"""
+        from langchain_community.chat_models import ChatOllama
 
-        # Add to vector database
-        self.vector_db = Chroma.from_documents(
-            documents=chunks, 
-            embedding=OllamaEmbeddings(model="znbang/bge:small-en-v1.5-q8_0", show_progress=False),
-            collection_name="local-rag"
+        return resources.get("llm", self.local_model, lambda: ScheduledRunnable(ChatOllama(
+            model=self.local_model, base_url=OLLAMA_BASE_URL, keep_alive=startup.OLLAMA_KEEP_ALIVE,
+        ), self.local_model))
+
+    def _open_index(self, key, base_key=None):
+        """Open the on-disk index for key. Returns True if it was completely built before.
+
+        An index not built yet starts from a copy of the vectors of the complete index
+        base_key, when given (and no leftover of an interrupted build is in the way).
+        Must be called with resources.lock("index", key) held.
+        """
+        from langchain_community.vectorstores import Chroma
+
+        self.current_index_key = key
+        self.corpus = None
+        persist_directory = os.path.join(INDEX_DIR, key)
+        if os.path.exists(os.path.join(persist_directory, INDEX_READY_MARKER)):
+            self.vector_db = resources.get("index", key, lambda: Chroma(
+                collection_name="local-rag",
+                embedding_function=self.get_embeddings(),
+                persist_directory=persist_directory
+            ))
+            return True
+
+        resources.discard("index", key)
+        resources.discard("bm25", key)
+        self._drop_compact_indexes(key)
+        self.answer_cache.invalidate(key)
+        if os.path.isdir(persist_directory):
+            # Leftovers of an interrupted build are not trustworthy
+            Chroma(collection_name="local-rag", persist_directory=persist_directory).delete_collection()
+            chunks_path = os.path.join(persist_directory, CHUNKS_FILENAME)
+            if os.path.exists(chunks_path):
+                os.remove(chunks_path)
+        elif base_key:
+            shutil.copytree(
+                os.path.join(INDEX_DIR, base_key), persist_directory,
+                ignore=shutil.ignore_patterns(INDEX_READY_MARKER, BM25_FILENAME, CHUNKS_FILENAME, "compact-*"),
+            )
+        self.vector_db = Chroma(
+            collection_name="local-rag",
+            embedding_function=self.get_embeddings(),
+            persist_directory=persist_directory
         )
+        return False
+
+    def _save_chunks(self, key, chunks):
+        """Append layout chunks to the index's chunk file: summarize_sections and summarize_hierarchy
+        start from the same chunks instead of splitting the PDF again"""
+        with open(os.path.join(INDEX_DIR, key, CHUNKS_FILENAME), "a", encoding="utf-8") as f:
+            f.writelines(json.dumps([chunk.page_content, chunk.metadata], ensure_ascii=False) + "\n" for chunk in chunks)
+
+    def _mark_index_ready(self, key, chunk_count, bm25=None):
+        if bm25 is not None:
+            bm25.save(os.path.join(INDEX_DIR, key, BM25_FILENAME))
+            resources.put("bm25", key, bm25)
+        with open(os.path.join(INDEX_DIR, key, INDEX_READY_MARKER), "w", encoding="utf-8") as f:
+            f.write(f"{chunk_count}\n")
+        resources.put("index", key, self.vector_db)
+        if self.vector_format != "chroma":
+            # Built now rather than on the first question
+            self.get_vector_store()
+
+    def _drop_compact_indexes(self, key):
+        for vector_format in COMPACT_FORMATS:
+            resources.discard("compact_index", (key, vector_format))
+            shutil.rmtree(compact_directory(os.path.join(INDEX_DIR, key), vector_format), ignore_errors=True)
+
+    def get_vector_store(self):
+        """Store searched for the current document: the Chroma index, or with RAG_VECTOR_FORMAT
+        set to float16/int8, its compact memory-mapped copy (built once, next to the index)"""
+        key = self.current_index_key
+        if (self.vector_format == "chroma" or self.corpus is not None or not key
+                or not os.path.exists(os.path.join(INDEX_DIR, key, INDEX_READY_MARKER))):
+            return self.vector_db
+        return resources.get("compact_index", (key, self.vector_format), lambda: CompactVectorStore.from_chroma(
+            compact_directory(os.path.join(INDEX_DIR, key), self.vector_format),
+            self.vector_format, self.vector_db, self.get_embeddings(),
+        ))
+
+    def split_documents(self, documents):
+        """Retrieval chunks of page Documents: the layout chunks of their PDF when it can be read, else fixed windows"""
+        file_path = _source_file(documents)
+        if self.chunker == "layout" and file_path:
+            return self.layout_chunker.split(file_path, {doc.metadata["page"] for doc in documents})
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+        return text_splitter.split_documents(documents)
+
+    def _chunk_windows(self, file_path, window_pages):
+        """Lazily yield (pages, total pages, retrieval chunks) per window of window_pages pages"""
+        if self.chunker == "layout":
+            pages = self.layout_chunker.iter_pages(file_path)
+            while True:
+                with metrics.timed("split"):
+                    window = list(itertools.islice(pages, window_pages))
+                if not window:
+                    return
+                yield len(window), window[0][1], [chunk for _, _, chunks in window for chunk in chunks]
+        else:
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+            for window in iter_windows(iter_pages(file_path), window_pages):
+                with metrics.timed("split"):
+                    chunks = text_splitter.split_documents(window)
+                yield len(window), window[0].metadata["total_pages"], chunks
+
+    def _layout_chunks(self, file_path, page_numbers=None):
+        """Retrieval chunks of the PDF's pages: read back from its index when it was ingested, else split now"""
+        key = self.index_key(doc_hash=file_sha256(file_path))
+        path = os.path.join(INDEX_DIR, key, CHUNKS_FILENAME)
+        if not os.path.exists(os.path.join(INDEX_DIR, key, INDEX_READY_MARKER)) or not os.path.exists(path):
+            return self.layout_chunker.split(file_path, page_numbers)
+        selected = set(page_numbers) if page_numbers is not None else None
+        chunks = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                text, metadata = json.loads(line)
+                if selected is None or metadata.get("page") in selected:
+                    chunks.append(Document(page_content=text, metadata=metadata))
+        return chunks
+
+    def summary_chunks(self, documents):
+        """Chunks summarize_sections works on: with the layout chunker, the paragraphs of each section
+        packed up to RAG_SECTION_CHUNK_CHARS, else windows of SUMMARY_CHUNK_SIZE characters"""
+        file_path = _source_file(documents)
+        if self.chunker == "layout" and file_path:
+            chunks = self._layout_chunks(file_path, {doc.metadata["page"] for doc in documents})
+            return self.layout_chunker.section_chunks(chunks)
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=SUMMARY_CHUNK_SIZE, chunk_overlap=100)
+        return text_splitter.split_documents(documents)
+
+    def create_vector_db(self, data):
+        """Create vector database from document chunks, reusing the on-disk index when it exists"""
+        key = self.index_key(data)
+        with resources.lock("index", key):
+            if self._open_index(key):
+                print(f"Vector database loaded from cache ({key}).")
+                return
+
+            print("Creating vector database")
+            stats_before = self.embeddings.stats.copy()
+            with metrics.timed("split"):
+                chunks = self.split_documents(data)
+
+            # Add to vector database
+            if chunks:
+                self.vector_db.add_documents(chunks)
+            if self.chunker == "layout" and _source_file(data):
+                self._save_chunks(key, chunks)
+            bm25 = BM25Index()
+            bm25.add_documents(chunks)
+            self._mark_index_ready(key, len(chunks), bm25)
+        print(f"Embedded {self.embeddings.stats - stats_before}")
         print("Vector database created successfully.")
 
+    def ingest_document(self, file_path, window_pages=None, on_progress=None, lineage=None):
+        """Stream a PDF into the vector database page by page.
+
+        Pages are read lazily and split/embedded in windows of window_pages, each window
+        being written to the index before the next one is read, so memory stays flat and
+        self.vector_db can be queried as soon as the first window is in.
+        on_progress(pages_done, total_pages) is called after every window; if it raises, ingestion
+        stops there and the incomplete index is rebuilt by the next ingestion of the document.
+
+        lineage names the document across revisions (e.g. its file name); every version's
+        index is recorded under it and kept on disk. A revision's index starts from a copy of
+        the latest version built with the same settings, and is diffed against it by chunk
+        text: unchanged chunks keep their vector and only get their new metadata (page,
+        source), new or changed chunks are embedded and added, and the chunks that are gone
+        are deleted. The keyword index and chunk file are rewritten, without model calls.
+
+        Returns {"pages", "chunks", "cached"}: the size of the index, and whether it was
+        already on disk.
+        """
+        window_pages = window_pages or self.ingest_window_pages
+        print(f"Ingesting document: {file_path}")
+        self.document_hash = file_sha256(file_path)
+        key = self.index_key()
+        with resources.lock("index", key):
+            previous_key = self._previous_version(lineage, key) if lineage else None
+            if self._open_index(key, base_key=previous_key):
+                print(f"Vector database loaded from cache ({key}).")
+                with open(os.path.join(INDEX_DIR, key, INDEX_READY_MARKER), "r", encoding="utf-8") as f:
+                    chunk_count = int(f.read().strip() or 0)
+                if lineage:
+                    self.get_index_versions().add(lineage, key, self.document_hash, self.index_config(), chunk_count)
+                return {"pages": page_count(file_path), "chunks": chunk_count, "cached": True}
+
+            stats_before = self.embeddings.stats.copy()
+            # Rows copied from the previous version, if any: text hash -> [ids]
+            previous = {}
+            stored = self.vector_db.get(include=["documents"])
+            for row_id, text in zip(stored["ids"], stored["documents"]):
+                previous.setdefault(text_hash(text), []).append(row_id)
+            bm25 = BM25Index()
+            pages_done = 0
+            chunk_count = 0
+            kept = 0
+            for pages_read, total_pages, chunks in self._chunk_windows(file_path, window_pages):
+                unchanged = []
+                changed = []
+                for chunk in chunks:
+                    ids = previous.get(text_hash(chunk.page_content))
+                    if ids:
+                        unchanged.append((ids.pop(), chunk))
+                    else:
+                        changed.append(chunk)
+                if unchanged:
+                    # Same text, possibly on another page: the vector stays, the metadata is the new one
+                    self.vector_db._collection.update(
+                        ids=[row_id for row_id, _ in unchanged],
+                        metadatas=[chunk.metadata for _, chunk in unchanged],
+                    )
+                if changed:
+                    self.vector_db.add_documents(changed)
+                bm25.add_documents(chunks)
+                if self.chunker == "layout":
+                    self._save_chunks(key, chunks)
+                pages_done += pages_read
+                chunk_count += len(chunks)
+                kept += len(unchanged)
+                if on_progress:
+                    on_progress(pages_done, total_pages)
+
+            stale = [row_id for ids in previous.values() for row_id in ids]
+            for start in range(0, len(stale), STALE_DELETE_BATCH):
+                self.vector_db._collection.delete(ids=stale[start:start + STALE_DELETE_BATCH])
+            if kept or stale:
+                print(f"Revision of {previous_key}: {kept} chunks kept, {chunk_count - kept} embedded, "
+                      f"{len(stale)} removed.")
+            self._mark_index_ready(key, chunk_count, bm25)
+            if lineage:
+                self.get_index_versions().add(lineage, key, self.document_hash, self.index_config(), chunk_count)
+        print(f"Embedded {self.embeddings.stats - stats_before}")
+        print(f"Document ingested successfully. Pages: {pages_done}")
+        return {"pages": pages_done, "chunks": chunk_count, "cached": False}
+
+    def get_corpus(self):
+        """The persistent multi-document corpus, shared process-wide"""
+        return resources.get("corpus", CORPUS_DIR, lambda: Corpus(
+            CORPUS_DIR,
+            self.get_embeddings(),
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            window_pages=self.ingest_window_pages,
+            layout_chunker=self.layout_chunker if self.chunker == "layout" else None,
+        ))
+
+    def use_corpus(self, doc_ids=None, where=None):
+        """Answer from the corpus instead of a single document.
+
+        Retrieval is restricted to doc_ids and/or the metadata conditions in where
+        (e.g. {"filename": "manual.pdf"}); by default it searches every document.
+        Call setup_retrieval_chain() afterwards, and again after adding or removing documents.
+        """
+        self.corpus = self.get_corpus()
+        self.vector_db = self.corpus.vector_db
+        self.corpus_scope = {"doc_ids": sorted(doc_ids or []), "where": where or {}}
+        scope = json.dumps(self.corpus_scope, sort_keys=True)
+        digest = hashlib.sha256(scope.encode("utf-8")).hexdigest()
+        version = self.corpus.version()
+        self.current_index_key = f"corpus-{version}-{digest[:16]}"
+        # Answers from before the last document was added or removed will not be asked for again
+        self.answer_cache.invalidate_superseded("corpus-", f"corpus-{version}-")
+
+    def get_bm25(self):
+        """Keyword index of the current document index (rebuilt from the vector store if missing)"""
+        key = self.current_index_key
+
+        def load():
+            path = os.path.join(INDEX_DIR, key, BM25_FILENAME)
+            if os.path.exists(path):
+                return BM25Index.load(path)
+            # Index built before keyword indexes existed
+            stored = self.vector_db.get(include=["documents", "metadatas"])
+            bm25 = BM25Index()
+            bm25.add_documents(
+                Document(page_content=text, metadata=metadata or {})
+                for text, metadata in zip(stored["documents"], stored["metadatas"])
+            )
+            bm25.save(path)
+            return bm25
+
+        return resources.get("bm25", key, load)
+
+    def get_retriever(self):
+        if self.corpus is not None:
+            return self.corpus.retriever(**self.corpus_scope)
+        if self.retrieval_mode == "hybrid" and self.current_index_key:
+            return HybridRetriever(vector_store=self.get_vector_store(), bm25=self.get_bm25())
+        return self.get_vector_store().as_retriever()
+
     def setup_retrieval_chain(self):
-        """Set up the retrieval and response chain"""
+        """Set up the retrieval and response chain (reused across sessions for the same index and model)"""
+        self.partial_index = False
+        if self.current_index_key:
+            self.chain = resources.get("chain", (self.current_index_key, self.local_model), self._build_retrieval_chain)
+        else:
+            self.chain = self._build_retrieval_chain()
+
+    def setup_partial_retrieval_chain(self):
+        """Answer from the pages ingest_document has indexed so far, while it goes on.
+
+        Vector search only (the keyword index is written at the end). The chain is not
+        shared and its answers are not cached; call setup_retrieval_chain() once
+        ingestion is done.
+        """
+        self.chain = self._build_retrieval_chain(self.vector_db.as_retriever())
+        self.partial_index = True
+
+    def _build_retrieval_chain(self, retriever=None):
         print("Setting up retrieval chain")
 
-        llm = ChatOllama(model=self.local_model)
+        llm = self.get_llm()
 
         QUERY_PROMPT = PromptTemplate(
             input_variables=["question"],
@@ -88,7 +551,7 @@ class LocalRAGApp:
             Original question: {question}""",
         )
 
-        retriever = self.vector_db.as_retriever()
+        retriever = (retriever or self.get_retriever()).with_listeners(**metrics.run_listeners("retrieve"))
 
         template = """Answer the question based ONLY on the following context:
         {context}
@@ -97,37 +560,59 @@ class LocalRAGApp:
 
         prompt = ChatPromptTemplate.from_template(template)
 
-        self.chain = (
-            {"context": retriever, "question": RunnablePassthrough()}
+        budget, chunk = self.context_budget(), chunk_tokens(self.retrieval_chunk_chars())
+        if budget < chunk:
+            print(f"Warning: RAG_CONTEXT_TOKENS={budget} is smaller than one retrieval chunk "
+                  f"({chunk} tokens); even the best match will be cut")
+
+        def pack(inputs):
+            # Keep the prompt within the token budget: the small model spends most of
+            # its time on prompt processing
+            text, stats = pack_context(
+                inputs["context"], inputs["question"],
+                max_tokens=self.context_budget(), trim_sentences=self.context_trim,
+            )
+            stats["prompt_tokens"] = estimate_tokens(template) + estimate_tokens(inputs["question"]) + stats["context_tokens"]
+            return {"text": text, "stats": stats}
+
+        # Retrieval runs once per question: the retrieved documents are returned under
+        # "context" next to the streamed "answer", so callers can show sources without
+        # searching again. "packed" holds the context actually sent to the model.
+        chain = RunnableParallel(
+            context=retriever, question=RunnablePassthrough()
+        ).assign(
+            packed=RunnableLambda(pack)
+        ).assign(
+            answer=RunnableLambda(lambda x: {"context": x["packed"]["text"], "question": x["question"]})
             | prompt
             | llm
             | StrOutputParser()
         )
         print("Retrieval chain setup complete.")
+        return chain
 
-    def summarize_sections(self, documents):
-        """Résumé clair par section, enregistré dans summaries.txt + envoi de métriques à Prometheus Pushgateway"""
-        print("Génération des résumés de sections...")
-        llm = ChatOllama(model=self.local_model)
+    def summarize_sections(self, documents, max_concurrency=None, resume=False, output_path=SUMMARY_OUTPUT_PATH,
+                           on_progress=None):
+        """Résumé clair par section, enregistré dans summaries.txt (ou output_path) + métriques Prometheus.
 
-        registry = CollectorRegistry()
-        summary_time = Gauge('summary_generation_seconds', 'Time spent generating summaries', registry=registry)
-        summary_chunks = Gauge('summary_chunks_total', 'Total number of chunks processed', registry=registry)
-        success_chunks = Gauge('summary_chunks_successful', 'Number of successfully summarized chunks', registry=registry)
-        failed_chunks = Gauge('summary_chunks_failed', 'Number of chunks that failed summarization', registry=registry)
+        Les chunks sont résumés en parallèle (au plus max_concurrency appels en cours) et écrits
+        dans l'ordre du document dès que leur tour arrive. Avec resume=True, les chunks déjà
+        résumés lors d'une exécution interrompue sont repris depuis summaries.txt.progress.
+        on_progress(chunks_faits, total) est appelé après chaque chunk ; s'il lève une exception,
+        les chunks restants sont abandonnés (le fichier .progress permet de reprendre).
+        """
+        progress_path = output_path + SUMMARY_PROGRESS_SUFFIX
+        print("Génération des résumés de sections...")
+        llm = self.get_llm()
+        max_concurrency = max_concurrency or self.summary_concurrency
 
         start_time = time.time()
-        total_chunks = 0
-        successful = 0
         failed = 0
 
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
-        chunks = text_splitter.split_documents(documents)
+        chunks = self.summary_chunks(documents)
+        chunk_hashes = [hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest() for chunk in chunks]
 
-        prompt_template = ChatPromptTemplate.from_template(
-            "Voici un extrait d'un document :\n\n{content}\n\nFais un résumé clair, simple à comprendre et concis. "
-            "Formate la sortie comme une liste Markdown propre, avec des puces de premier niveau uniquement (pas de puces imbriquées)."
-        )
+        prompt_template = ChatPromptTemplate.from_template(SUMMARY_PROMPT)
 
         chain = (
             {"content": lambda x: x.page_content}
@@ -136,88 +621,413 @@ class LocalRAGApp:
             | StrOutputParser()
         )
 
-        with open("summaries.txt", "w", encoding="utf-8") as f:
-            for chunk in chunks:
-                total_chunks += 1
-                try:
-                    summary = chain.invoke(chunk)
-                    if summary.strip():
-                        successful += 1
+        # Summaries finished by a previous, interrupted run (index -> summary)
+        results = {}
+        if resume and os.path.exists(progress_path):
+            with open(progress_path, "r", encoding="utf-8") as progress:
+                for line in progress:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # line cut short by the crash
+                    index = entry.get("index")
+                    if isinstance(index, int) and 0 <= index < len(chunks) and entry.get("hash") == chunk_hashes[index]:
+                        results[index] = entry["summary"]
+            print(f"Reprise : {len(results)} chunks déjà résumés.")
+
+        cache_keys = [SummaryCache.key(chunk.page_content, self.local_model, SUMMARY_PROMPT) for chunk in chunks]
+        cached = self.summary_cache.get_many(key for i, key in enumerate(cache_keys) if i not in results)
+        for i, key in enumerate(cache_keys):
+            if i not in results and key in cached:
+                results[i] = cached[key]
+        print(f"{len(cached)} résumés trouvés dans le cache.")
+        metrics.SUMMARY_CHUNKS.labels("cached").inc(len(cached))
+
+        pending = [i for i in range(len(chunks)) if i not in results]
+        total_chunks = len(chunks)
+        successful = sum(1 for summary in results.values() if summary.strip())
+
+        next_to_write = 0
+        with open(output_path, "w", encoding="utf-8") as f, \
+                open(progress_path, "a" if results else "w", encoding="utf-8") as progress:
+
+            def write_ready():
+                # Write every summary whose predecessors are all done, in document order
+                nonlocal next_to_write
+                while next_to_write in results:
+                    summary = results.pop(next_to_write)
+                    if summary and summary.strip():
                         f.write(summary + "\n\n" + "-" * 60 + "\n\n")
-                except Exception as e:
-                    failed += 1
-                    print(f"Erreur sur un chunk : {e}")
+                    next_to_write += 1
+                f.flush()
 
-        duration = time.time() - start_time
-        summary_time.set(duration)
-        summary_chunks.set(total_chunks)
-        success_chunks.set(successful)
-        failed_chunks.set(failed)
+            write_ready()
+            done = total_chunks - len(pending)
+            if on_progress:
+                on_progress(done, total_chunks)
+            stopped = threading.Event()
+            # Bulk work: questions asked meanwhile go first
+            with priority(BATCH):
+                outputs = _until_stopped(chain, stopped).batch_as_completed(
+                    [chunks[i] for i in pending],
+                    config={"max_concurrency": max_concurrency},
+                    return_exceptions=True,
+                )
+                try:
+                    for position, summary in outputs:
+                        index = pending[position]
+                        if isinstance(summary, Exception):
+                            failed += 1
+                            metrics.SUMMARY_CHUNKS.labels("failed").inc()
+                            results[index] = None
+                            print(f"Erreur sur un chunk : {summary}")
+                        else:
+                            metrics.SUMMARY_CHUNKS.labels("ok").inc()
+                            if summary.strip():
+                                successful += 1
+                                self.summary_cache.put(cache_keys[index], summary)
+                            results[index] = summary
+                            progress.write(json.dumps({"index": index, "hash": chunk_hashes[index], "summary": summary}) + "\n")
+                            progress.flush()
+                        write_ready()
+                        done += 1
+                        if on_progress:
+                            on_progress(done, total_chunks)
+                finally:
+                    stopped.set()
+                    outputs.close()
 
-        raw_gateway = os.getenv("PUSHGATEWAY_URL", "http://localhost:9091")
-        gateway = raw_gateway.replace("http://", "").replace("https://", "")
+        if not failed:
+            # Nothing left to resume
+            os.remove(progress_path)
 
-        try:
-            push_to_gateway(gateway, job='localrag_summary_job', registry=registry)
-            print("✅ Metrics pushed successfully to Prometheus Pushgateway!")
-        except Exception as e:
-            print(f"⚠️ Could not push metrics: {e}")
+        duration = time.time() - start_time
+        metrics.observe("summarize", duration)
+        print(f"{successful}/{total_chunks} chunks résumés, {failed} en erreur, en {duration:.1f}s.")
+        # Sans endpoint /metrics (ligne de commande) : envoi au Pushgateway, hors du chemin critique
+        metrics.push_async("localrag_summary_job")
 
-        print("Résumé enregistré dans summaries.txt")
+        print(f"Résumé enregistré dans {output_path}")
 
     def get_sources(self, question):
-        """Retrieve source documents for a given question"""
+        """Retrieve source documents for a given question.
+
+        Runs a new search: when answering through self.chain, use its "context" output instead.
+        """
         if not self.vector_db:
             return []
         try:
-            retriever = self.vector_db.as_retriever()
+            retriever = self.get_retriever()
             docs = retriever.invoke(question)
             return docs
         except Exception as e:
             print(f"Error retrieving sources: {e}")
             return []
 
-    def summarize_selected_pages(self, file_path, page_numbers):
-        """Summarize specific pages from the PDF and save to summaries.txt"""
+    def _summarize_cached(self, chain, prompt, inputs, cache_texts, max_concurrency, on_step=None):
+        """Run chain on inputs in parallel, at batch priority, through the summary cache.
 
-        import fitz  # PyMuPDF
+        cache_texts[i] identifies inputs[i] in the cache. Returns (summaries, cached, failed);
+        failed inputs get an empty summary. on_step() is called after every finished input;
+        if it raises, the remaining inputs are abandoned.
+        """
+        keys = [SummaryCache.key(text, self.local_model, prompt) for text in cache_texts]
+        cached = self.summary_cache.get_many(set(keys))
+        summaries = [cached.get(key) for key in keys]
+        pending = [i for i, summary in enumerate(summaries) if summary is None]
+        failed = 0
+        if pending:
+            stopped = threading.Event()
+            with priority(BATCH):
+                outputs = _until_stopped(chain, stopped).batch_as_completed(
+                    [inputs[i] for i in pending],
+                    config={"max_concurrency": max_concurrency},
+                    return_exceptions=True,
+                )
+                try:
+                    for position, summary in outputs:
+                        index = pending[position]
+                        if isinstance(summary, Exception):
+                            failed += 1
+                            print(f"Erreur de résumé : {summary}")
+                            summary = ""
+                        elif summary.strip():
+                            self.summary_cache.put(keys[index], summary)
+                        summaries[index] = summary
+                        if on_step:
+                            on_step()
+                finally:
+                    stopped.set()
+                    outputs.close()
+        return summaries, len(inputs) - len(pending), failed
 
-        print(f"Summarizing selected pages: {page_numbers}")
-        llm = ChatOllama(model=self.local_model)
+    def summarize_hierarchy(self, file_path, page_numbers=None, max_concurrency=None, output_path=SUMMARY_OUTPUT_PATH,
+                            on_progress=None):
+        """Résumé hiérarchique du PDF, enregistré comme plan Markdown dans output_path.
 
-        with fitz.open(file_path) as doc:
-            selected_texts = []
-            for page_num in page_numbers:
-                if 0 <= page_num < len(doc):
-                    text = doc[page_num].get_text()
-                    selected_texts.append(text)
+        Les chunks sont résumés en parallèle, puis leurs résumés sont fusionnés section par
+        section (table des matières du PDF, sinon groupes de pages) jusqu'au résumé du document.
+        Chaque niveau passe par le cache : après une modification du document, ou pour une
+        partie des pages (page_numbers, base 0), seules les branches concernées sont recalculées.
+        on_progress(étapes_faites, total) suit les chunks puis les fusions (comptées une par
+        section : le total est une estimation) ; s'il lève une exception, le résumé est abandonné.
+        Retourne le résumé du document.
+        """
+        print("Génération du résumé hiérarchique...")
+        start_time = time.time()
+        llm = self.get_llm()
+        max_concurrency = max_concurrency or self.summary_concurrency
 
-        summaries = []
-        prompt_template = ChatPromptTemplate.from_template(
-            "Voici un extrait d'un document :\n\n{content}\n\nFais un résumé clair, simple à comprendre et concis. "
-            "Formate la sortie comme une liste Markdown propre, avec des puces de premier niveau uniquement (pas de puces imbriquées)."
-    )
+        root = build_outline(file_path, page_numbers)
+        nodes = list(root.walk())
+        pages = sorted({p for node in nodes for p in node.own_pages})
+
+        # Map : mêmes chunks (et donc même cache) que summarize_sections
+        if self.chunker == "layout":
+            page_chunks = self.layout_chunker.section_chunks(self._layout_chunks(file_path, pages))
+        else:
+            page_texts = extract_page_texts(file_path, pages)
+            page_chunks = self.summary_chunks([
+                Document(page_content=page_texts[p], metadata={"page": p}) for p in pages if p in page_texts
+            ])
+        by_page = {}
+        for chunk in page_chunks:
+            by_page.setdefault(chunk.metadata["page"], []).append(chunk.page_content)
+        own_chunks = {node: [chunk for p in node.own_pages for chunk in by_page.get(p, [])] for node in nodes}
+        chunks = [chunk for node in nodes for chunk in own_chunks[node]]
+        map_chain = (
+            {"content": RunnablePassthrough()}
+            | ChatPromptTemplate.from_template(SUMMARY_PROMPT)
+            | llm
+            | StrOutputParser()
+        )
+        steps_done = 0
+        steps_total = len(chunks) + len(nodes)
+
+        def step(count=1):
+            nonlocal steps_done, steps_total
+            steps_done += count
+            steps_total = max(steps_total, steps_done + 1)
+            if on_progress:
+                on_progress(steps_done, steps_total)
 
+        chunk_summaries, cached, failed = self._summarize_cached(
+            map_chain, SUMMARY_PROMPT, chunks, chunks, max_concurrency, on_step=step,
+        )
+        step(cached)
+        metrics.SUMMARY_CHUNKS.labels("cached").inc(cached)
+        metrics.SUMMARY_CHUNKS.labels("ok").inc(len(chunks) - cached - failed)
+        metrics.SUMMARY_CHUNKS.labels("failed").inc(failed)
+        print(f"{len(chunks)} chunks résumés ({cached} depuis le cache, {failed} en erreur).")
+
+        summaries = iter(chunk_summaries)
+        parts = {node: [next(summaries) for _ in own_chunks[node]] for node in nodes}
+
+        # Reduce : les sections de même hauteur sont fusionnées ensemble, des feuilles à la racine
+        merge_chain = ChatPromptTemplate.from_template(MERGE_PROMPT) | llm | StrOutputParser()
+        merges = 0
+        merges_cached = 0
+        for height in sorted({node.height for node in nodes}):
+            level = [node for node in nodes if node.height == height]
+            pending = {
+                node: [text for text in parts[node] + [child.summary for child in node.children] if text.strip()]
+                for node in level
+            }
+            while any(len(texts) > 1 for texts in pending.values()):
+                calls = []  # (node, group)
+                for node, texts in pending.items():
+                    if len(texts) <= 1:
+                        continue
+                    groups = merge_groups(texts)
+                    if len(groups) == len(texts):
+                        # Every summary is too long to be grouped: merge them two by two
+                        groups = [texts[i:i + 2] for i in range(0, len(texts), 2)]
+                    calls.extend((node, group) for group in groups)
+                inputs = [{"title": node.title, "content": "\n\n".join(group)} for node, group in calls]
+                results, cached, failed = self._summarize_cached(
+                    merge_chain, MERGE_PROMPT, inputs,
+                    [f"{i['title']}\0{i['content']}" for i in inputs], max_concurrency, on_step=step,
+                )
+                step(cached)
+                merges += len(calls)
+                merges_cached += cached
+                for node in pending:
+                    if len(pending[node]) > 1:
+                        pending[node] = []
+                for (node, group), result in zip(calls, results):
+                    # A failed merge keeps its parts rather than losing them
+                    pending[node].append(result if result.strip() else "\n".join(group))
+            for node, texts in pending.items():
+                node.summary = texts[0] if texts else ""
+        print(f"{merges} fusions ({merges_cached} depuis le cache).")
+
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(render_markdown(root))
+        if on_progress:
+            on_progress(steps_done, steps_done)
+        metrics.observe("summarize", time.time() - start_time)
+        metrics.push_async("localrag_summary_job")
+        print(f"Résumé hiérarchique enregistré dans {output_path}")
+        return root.summary
+
+    def _summarize_page_texts(self, doc_hash, page_texts, max_concurrency=None):
+        """Summarize {page: text} in parallel, recording the results in the page summary index"""
+        llm = self.get_llm()
         chain = (
             {"content": lambda x: x}
-            | prompt_template
+            | ChatPromptTemplate.from_template(SUMMARY_PROMPT)
             | llm
             | StrOutputParser()
-    )
+        )
+        pages = [page for page, text in page_texts.items() if text.strip()]
+        texts = [page_texts[page] for page in pages]
+        summaries, _, failed = self._summarize_cached(
+            chain, SUMMARY_PROMPT, texts, texts, max_concurrency or self.summary_concurrency,
+        )
+        results = {page: "" for page, text in page_texts.items() if not text.strip()}
+        results.update((page, summary) for page, summary in zip(pages, summaries) if summary.strip())
+        # Failed pages are left out, to be tried again next time
+        self.page_summaries.put_many(doc_hash, results, self.local_model, SUMMARY_PROMPT)
+        return results
+
+    def summarize_pages(self, file_path, page_numbers, max_concurrency=None):
+        """Return {page: summary} for the given pages (0-based).
 
-        with open("summaries.txt", "w", encoding="utf-8") as f:
-            for page_text in selected_texts:
+        Pages already in the page summary index are served without opening the PDF; the
+        others are extracted and summarized together, in parallel.
+        """
+        doc_hash = file_sha256(file_path)
+        summaries = self.page_summaries.get_many(doc_hash, page_numbers, self.local_model, SUMMARY_PROMPT)
+        missing = [page for page in page_numbers if page not in summaries]
+        print(f"{len(summaries)} of {len(set(page_numbers))} pages found in the page summary index.")
+        if missing:
+            summaries.update(self._summarize_page_texts(doc_hash, extract_page_texts(file_path, missing), max_concurrency))
+        return summaries
+
+    def start_page_summary_prefill(self, file_path):
+        """Summarize every page of the PDF in a background thread (once per document and model).
+
+        The text is read in that thread too; if the file was replaced by then, nothing is
+        summarized. Work runs at batch priority, a few pages at a time, skipping pages
+        already summarized.
+        """
+        if not PAGE_SUMMARY_PREFILL:
+            return None
+        doc_hash = file_sha256(file_path)
+
+        def prefill():
+            def run():
                 try:
-                    summary = chain.invoke(page_text)
-                    if summary.strip():
-                        f.write(summary + "\n\n" + "-" * 60 + "\n\n")
-                        summaries.append(summary)
+                    page_texts = extract_page_texts(file_path)
+                    if file_sha256(file_path) != doc_hash:
+                        print("Page summary prefill skipped: the file changed.")
+                        return
                 except Exception as e:
-                    print(f"Error summarizing a page: {e}")
-    
+                    print(f"Page summary prefill stopped: {e}")
+                    return
+                pages = sorted(page_texts)
+                done = self.page_summaries.get_many(doc_hash, pages, self.local_model, SUMMARY_PROMPT)
+                pending = [page for page in pages if page not in done]
+                for start in range(0, len(pending), PREFILL_BATCH_PAGES):
+                    batch = pending[start:start + PREFILL_BATCH_PAGES]
+                    try:
+                        self._summarize_page_texts(doc_hash, {page: page_texts[page] for page in batch})
+                    except Exception as e:
+                        print(f"Page summary prefill stopped: {e}")
+                        return
+                print(f"Page summaries ready for {len(pages)} pages.")
+
+            thread = threading.Thread(target=run, name=f"page-summaries-{doc_hash[:8]}", daemon=True)
+            thread.start()
+            return thread
+
+        return resources.get("page_prefill", (doc_hash, self.local_model), prefill)
+
+    def summarize_selected_pages(self, file_path, page_numbers, output_path=SUMMARY_OUTPUT_PATH):
+        """Summarize specific pages from the PDF and save to summaries.txt (or output_path)"""
+
+        print(f"Summarizing selected pages: {page_numbers}")
+        page_summaries = self.summarize_pages(file_path, page_numbers)
+
+        summaries = []
+        with open(output_path, "w", encoding="utf-8") as f:
+            for page_num in page_numbers:
+                summary = page_summaries.get(page_num, "")
+                if summary.strip():
+                    f.write(summary + "\n\n" + "-" * 60 + "\n\n")
+                    summaries.append(summary)
+
         return summaries
- 
-    
+
+    def _answer_scope(self):
+        """Answers are reused only with the same index, model and retrieval settings"""
+        return (self.current_index_key, self.local_model, self.retrieval_mode, self.vector_format,
+                self.context_budget(), self.context_trim)
+
+    def _cached_answer(self, question, vector, start_time):
+        """Chunks replaying a cached answer to question, or None"""
+        cached = self.answer_cache.lookup(self._answer_scope(), question, vector)
+        if not cached:
+            return None
+        stats = {"cached": True, "time_to_first_token_s": time.time() - start_time}
+        self.last_query_stats = stats
+        metrics.QUERIES.labels("cache").inc()
+        chunks = [{"context": cached.sources}]
+        chunks.extend({"answer": piece} for piece in re.findall(r"\S+\s*|\s+", cached.answer))
+        chunks.append({"stats": stats})
+        return chunks
+
+    def _store_answer(self, question, vector, recorder):
+        recorder.stats["total_s"] = time.time() - recorder.start_time
+        self.last_query_stats = recorder.stats
+        metrics.observe("generate", recorder.stats["total_s"])
+        metrics.QUERIES.labels("model").inc()
+        if recorder.answer.strip() and not self.partial_index:
+            self.answer_cache.store(self._answer_scope(), question, vector, recorder.answer, recorder.sources)
+
+    def stream_answer(self, question):
+        """Stream the answer to a question, like self.chain.stream.
+
+        Yields {"context": [documents]} first, then {"answer": text} pieces, and last
+        {"stats": ...}: this answer's latencies and prompt size (self.last_query_stats is
+        overwritten by every question, including concurrent ones). Answers to the same or a
+        near-duplicate question about the same index come from the answer cache and are
+        replayed in small pieces, so callers render them the same way.
+        """
+        start_time = time.time()
+        vector = self.get_embeddings().embed_query(question)
+        cached = self._cached_answer(question, vector, start_time)
+        if cached:
+            yield from cached
+            return
+
+        recorder = AnswerRecorder(start_time)
+        for chunk in self.chain.stream(question):
+            recorder.observe(chunk)
+            yield chunk
+        self._store_answer(question, vector, recorder)
+        yield {"stats": recorder.stats}
+
+    async def astream_answer(self, question):
+        """Asynchronous stream_answer, built on self.chain.astream.
+
+        Closing the generator early (e.g. the client went away) cancels the generation.
+        """
+        start_time = time.time()
+        vector = await asyncio.to_thread(self.get_embeddings().embed_query, question)
+        cached = self._cached_answer(question, vector, start_time)
+        if cached:
+            for chunk in cached:
+                yield chunk
+            return
+
+        recorder = AnswerRecorder(start_time)
+        async for chunk in self.chain.astream(question):
+            recorder.observe(chunk)
+            yield chunk
+        self._store_answer(question, vector, recorder)
+        yield {"stats": recorder.stats}
+
     def query(self, question):
         """Query the RAG system"""
         if not self.chain:
@@ -225,19 +1035,56 @@ class LocalRAGApp:
             return
         
         print("Processing your question...")
-        result = self.chain.invoke(question)
+        result = "".join(chunk.get("answer", "") for chunk in self.stream_answer(question))
         print("\nResponse:")
         print(result)
+        print(f"\n({self.describe_query_stats()})")
+
+    def describe_query_stats(self, stats=None):
+        """One-line summary of an answer's latency and prompt size (by default, the last answer's)"""
+        stats = stats if stats is not None else self.last_query_stats
+        if stats.get("cached"):
+            return "answer served from cache"
+        parts = []
+        if "time_to_sources_s" in stats:
+            parts.append(f"sources after {stats['time_to_sources_s']:.2f}s")
+        if "time_to_first_token_s" in stats:
+            parts.append(f"first token after {stats['time_to_first_token_s']:.2f}s")
+        if "prompt_tokens" in stats:
+            parts.append(
+                f"~{stats['prompt_tokens']} prompt tokens "
+                f"({stats['used_documents']}/{stats['retrieved_documents']} chunks, "
+                f"{stats['context_tokens']} of {stats['retrieved_tokens']} context tokens kept)"
+            )
+        return ", ".join(parts)
     
 
-    def cleanup(self):
-        """Clean up resources"""
-        if self.vector_db:
+    def cleanup(self, purge=False):
+        """Clean up resources. The on-disk index is kept for the next run unless purge is True.
+
+        In corpus mode nothing is deleted: use get_corpus().remove_document() instead.
+        """
+        if self.vector_db and purge and self.corpus is None:
             self.vector_db.delete_collection()
+            if self.current_index_key:
+                key = self.current_index_key
+                resources.discard("chain", (key, self.local_model))
+                resources.discard("index", key)
+                resources.discard("bm25", key)
+                self._drop_compact_indexes(key)
+                self.answer_cache.invalidate(key)
+                ready_marker = os.path.join(INDEX_DIR, key, INDEX_READY_MARKER)
+                if os.path.exists(ready_marker):
+                    os.remove(ready_marker)
             print("Vector database collection deleted.")
+        self.vector_db = None
+        self.chain = None
+        self.corpus = None
 
 def main():
     app = LocalRAGApp()
+    # The models load while the questions below are answered
+    app.start_warm_up()
     
     print("\nLocal RAG Application with Ollama")
     print("--------------------------------")
@@ -254,9 +1101,9 @@ def main():
         return
     
     data = app.load_document(file_path)
-    app.summarize_sections(data)  # Génére et exporte les résumés
-
+    # Index d'abord : les résumés repartent des chunks enregistrés avec l'index
     app.create_vector_db(data)
+    app.summarize_sections(data)  # Génére et exporte les résumés
     app.setup_retrieval_chain()
     
     # Interactive query loop
@@ -1,7 +1,13 @@
 import streamlit as st
-import fitz  # PyMuPDF for PDF preview and page selection (new added feature)
 import html
-from app import LocalRAGApp  # importing app.py
+import os
+import uuid
+import hashlib
+from concurrent.futures import wait
+from startup import timer
+from jobs import CANCELLED, DONE, FAILED, QUEUED, jobs
+from metrics import start_metrics_server
+from previews import previews
 
 st.set_page_config(page_title="Local RAG QA", layout="wide", page_icon="")
 
@@ -213,8 +219,124 @@ st.markdown(
     """,
     unsafe_allow_html=True,
 )
-app = LocalRAGApp()
-data = None
+# Prometheus scrapes this process on RAG_METRICS_PORT (started once, not on every rerun)
+start_metrics_server()
+
+# Imported once the page header is drawn: the first visit to a fresh process sees the page
+# at once. Reruns find the module already imported
+with timer.step("import app"):
+    from app import SUMMARY_DIR, UPLOAD_DIR, LocalRAGApp  # importing app.py
+    from scheduler import BATCH, priority
+
+if "warm_up" not in st.session_state:
+    # Vector store, PDF parser and models are made ready while the user picks a file
+    st.session_state.warm_up = LocalRAGApp().start_warm_up()
+
+
+def save_upload(uploaded_file):
+    """Store an uploaded PDF under its content hash, so uploads never overwrite each other"""
+    data = uploaded_file.getvalue()
+    path = os.path.join(UPLOAD_DIR, hashlib.sha256(data).hexdigest() + ".pdf")
+    if not os.path.exists(path):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        tmp_path = "{}.{}.part".format(path, uuid.uuid4().hex)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return path
+
+
+def ingestion_job(file_path, name):
+    def run(job):
+        # One app per document; the models, caches and indexes behind it are shared
+        # process-wide (see registry.py), so reruns and other sessions reuse them
+        rag = LocalRAGApp()
+
+        def progress(done, total):
+            job.progress(done, total)
+            if job.partial_result is None and done < total:
+                # The first pages are in the index: questions can be asked while the rest goes in
+                rag.setup_partial_retrieval_chain()
+                job.partial_result = rag
+
+        # Re-uploading a revision under the same name only embeds what changed. Embedding
+        # runs at batch priority: questions on documents already loaded go first
+        with priority(BATCH):
+            rag.ingest_document(file_path, lineage=name, on_progress=progress)
+        rag.setup_retrieval_chain()
+        # Page summaries are prepared in the background for "Preview & Select Pages"
+        rag.start_page_summary_prefill(file_path)
+        return rag
+    return run
+
+
+def summary_job(rag, file_path, output_path, hierarchical):
+    def run(job):
+        if hierarchical:
+            rag.summarize_hierarchy(file_path, output_path=output_path, on_progress=job.progress)
+        else:
+            rag.summarize_sections(rag.load_document(file_path), output_path=output_path, on_progress=job.progress)
+        return output_path
+    return run
+
+
+def source_pages(docs):
+    """Pages of the retrieved chunks, best match first, without duplicates"""
+    pages = [doc.metadata.get("page") for doc in docs]
+    return list(dict.fromkeys(page for page in pages if isinstance(page, int)))
+
+
+def sources_html(pages):
+    pills = " ".join("<span class='source-pill'>Page {}</span>".format(p + 1) for p in sorted(pages))
+    return "<div class=\"response-label\">Sources</div><div>{}</div>".format(pills)
+
+
+def show_preview(container, future, page):
+    """Show a page image once rendered; returns True when there is nothing left to wait for"""
+    if not future.done():
+        return False
+    if future.exception() is None:
+        container.image(future.result(), caption="Page {} (best match)".format(page + 1), width=420)
+    return True
+
+
+def describe_job(job):
+    if not job.total:
+        return "Waiting in line..." if job.status == QUEUED else "Starting..."
+    text = "{} of {} {}".format(job.done, job.total, job.unit)
+    if job.eta is not None:
+        text += ", about {:.0f}s left".format(job.eta)
+    return text
+
+
+def job_running(job_id):
+    job = jobs.get(job_id) if job_id else None
+    return job is not None and not job.finished
+
+
+def show_job(job, label):
+    """Progress bar and cancel button of a job; returns True once it is finished"""
+    if job.status == DONE:
+        return True
+    if job.status == FAILED:
+        st.error("{} failed: {}".format(label, job.error))
+        return True
+    if job.status == CANCELLED:
+        st.warning("{} cancelled.".format(label))
+        return True
+    st.progress(job.fraction, text="{}: {}".format(label, describe_job(job)))
+    if job.cancel_requested:
+        st.caption("Cancelling...")
+    elif st.button("Cancel", key="cancel-" + job.id):
+        jobs.cancel(job.id)
+    return False
+
+
+# Documents uploaded in this browser session: file path -> {"name", "job", "app", "partial", "summary_job"}.
+# "partial" is the app answering from the pages indexed so far, "app" the one of the complete index
+if "documents" not in st.session_state:
+    st.session_state.documents = {}
+documents = st.session_state.documents
 
 with st.sidebar:
     st.markdown(
@@ -226,20 +348,52 @@ with st.sidebar:
         """,
         unsafe_allow_html=True,
     )
-    uploaded_file = st.file_uploader("Choose a PDF", type=["pdf"])
-
-    if uploaded_file:
-        with open("temp.pdf", "wb") as f:
-            f.write(uploaded_file.read())
-        data = app.load_document("temp.pdf")
-
-        with st.spinner("Processing your document..."):
-            app.create_vector_db(data)
-            app.setup_retrieval_chain()
+    uploaded_files = st.file_uploader("Choose PDFs", type=["pdf"], accept_multiple_files=True)
+
+    # Each new upload is queued as a background job; the page stays usable meanwhile
+    for uploaded_file in uploaded_files or []:
+        file_path = save_upload(uploaded_file)
+        if file_path not in documents:
+            job = jobs.submit("ingest", uploaded_file.name, ingestion_job(file_path, uploaded_file.name))
+            documents[file_path] = {"name": uploaded_file.name, "job": job.id, "app": None, "partial": None, "summary_job": None}
+
+    pending = [entry for entry in documents.values() if entry["app"] is None and job_running(entry["job"])]
+
+    def ingestion_progress():
+        changed = False
+        for entry in documents.values():
+            job = jobs.get(entry["job"])
+            if entry["app"] is not None or job is None:
+                continue
+            if show_job(job, entry["name"]):
+                changed = changed or entry in pending
+                entry["partial"] = None
+                if job.status == DONE:
+                    entry["app"] = job.result
+            elif entry["partial"] is None and job.partial_result is not None:
+                entry["partial"] = job.partial_result
+                changed = True
+        if changed:
+            # A document can now be queried, fully or in part (or will not be): redraw the whole page
+            st.rerun()
+
+    # Polls the jobs every second while some are still running
+    st.fragment(ingestion_progress, run_every=1.0 if pending else None)()
+
+    ready = [file_path for file_path, entry in documents.items() if entry["app"] is not None or entry["partial"] is not None]
+    file_path = None
+    if ready:
+        file_path = st.selectbox(
+            "Document", ready, index=len(ready) - 1, format_func=lambda path: documents[path]["name"]
+        )
+        if documents[file_path]["app"] is not None:
+            st.success("PDF processed and ready!")
+        else:
+            st.info("Still indexing: answers come from the pages indexed so far.")
 
-        st.success("PDF processed and ready!")
+app = (documents[file_path]["app"] or documents[file_path]["partial"]) if file_path else None
 
-if uploaded_file:
+if app is not None:
     st.markdown("---")
     st.markdown(
         """
@@ -254,42 +408,47 @@ if uploaded_file:
     with st.expander("Type your question below", expanded=True):
         question = st.text_input("Ask a question about your document")
 
-    if uploaded_file and question:
+    if question:
+        # The sources arrive with the retrieval results, before the first token: they are
+        # shown at once, the best match's page is rendered meanwhile, and the answer streams below
+        sources_placeholder = st.empty()
+        preview_placeholder = st.empty()
+        placeholder = st.empty()
+        preview = None
+        preview_shown = False
+        query_stats = None
         with st.spinner("Searching the document..."):
-            placeholder = st.empty()
             full_text = ""
-            for chunk in app.chain.stream(question):
-                full_text += chunk
+            for chunk in app.stream_answer(question):
+                if "context" in chunk:
+                    pages = source_pages(chunk["context"])
+                    if pages:
+                        sources_placeholder.markdown(
+                            "<div class=\"response-block\">{}</div>".format(sources_html(pages)),
+                            unsafe_allow_html=True,
+                        )
+                        top_page = pages[0]
+                        preview = previews.prefetch(file_path, top_page)
+                        # The other source pages too, for "Preview & Select Pages"
+                        for page in pages[1:]:
+                            previews.prefetch(file_path, page)
+                if preview is not None and not preview_shown:
+                    preview_shown = show_preview(preview_placeholder, preview, top_page)
+                query_stats = chunk.get("stats", query_stats)
+                if "answer" not in chunk:
+                    continue
+                full_text += chunk["answer"]
                 safe_text = html.escape(full_text)
                 placeholder.markdown(
                     "<div class=\"response-block\"><div class=\"response-label\">Answer</div><div class=\"response-content\">{}</div></div>".format(safe_text),
                     unsafe_allow_html=True,
                 )
 
-        # After streaming finishes, fetch sources and append them as footnote-style pills
-        source_html = ""
-        try:
-            docs = app.get_sources(question)
-            pages = sorted(
-                {
-                    doc.metadata.get("page")
-                    for doc in docs
-                    if isinstance(doc.metadata.get("page"), int)
-                }
-            )
-            if pages:
-                pills = " ".join(
-                    "<span class='source-pill'>Page {}</span>".format(p + 1) for p in pages
-                )
-                source_html = "<div class=\"response-label\" style=\"margin-top: 1rem;\">Sources</div><div>{}</div>".format(pills)
-        except Exception as e:
-            # In case of any retrieval error, just skip showing sources
-            source_html = ""
-
-        safe_final_text = html.escape(full_text)
-        final_html = "<div class=\"response-block\"><div class=\"response-label\">Answer</div><div class=\"response-content\">{}</div>{}</div>".format(safe_final_text, source_html)
-
-        placeholder.markdown(final_html, unsafe_allow_html=True)
+        if preview is not None and not preview_shown:
+            # Very short (e.g. cached) answers can finish before the page is rendered
+            wait([preview], timeout=5)
+            show_preview(preview_placeholder, preview, top_page)
+        st.caption(app.describe_query_stats(query_stats))
 
     st.markdown("---")
     st.markdown(
@@ -303,26 +462,51 @@ if uploaded_file:
     )
 
     with st.expander("Generate a simplified summary of the entire PDF"):
-        if st.button("Summarize PDF Sections"):
-            with st.spinner("Summarizing..."):
-                app.summarize_sections(data)
-                try:
-                    with open("summaries.txt", "r", encoding="utf-8") as f:
-                        summaries = f.read()
-                    st.success("Summary generated!")
-                    safe_summaries = html.escape(summaries)
-                    summary_html = "<div class=\"response-block\"><div class=\"response-label\">Summary</div><div class=\"response-content\">{}</div></div>".format(safe_summaries)
-
-                    st.markdown(summary_html, unsafe_allow_html=True)
-
-                    st.download_button(
-                        label="Download Summary (.txt)",
-                        data=summaries,
-                        file_name="resume_sections.txt",
-                        mime="text/plain"
-                    )
-                except FileNotFoundError:
-                    st.error("Something went wrong.")
+        hierarchical = st.checkbox(
+            "One summary per section, merged up to a document summary",
+            help="Follows the PDF's table of contents (or groups of pages) instead of listing every chunk summary.",
+        )
+        document = documents[file_path]
+        if st.button("Summarize PDF Sections", disabled=job_running(document["summary_job"])):
+            os.makedirs(SUMMARY_DIR, exist_ok=True)
+            output_path = os.path.join(SUMMARY_DIR, "{}-{}.txt".format(os.path.basename(file_path)[:-4], uuid.uuid4().hex))
+            job = jobs.submit(
+                "summary", document["name"], summary_job(app, file_path, output_path, hierarchical),
+                unit="steps" if hierarchical else "chunks",
+            )
+            document["summary_job"] = job.id
+
+        summarizing = job_running(document["summary_job"])
+
+        def summary_progress():
+            job = jobs.get(document["summary_job"]) if document["summary_job"] else None
+            if job is None or not show_job(job, "Summary"):
+                return
+            if summarizing:
+                # Finished since the last full run: redraw the page with the result
+                st.rerun()
+            if job.status != DONE:
+                return
+            try:
+                with open(job.result, "r", encoding="utf-8") as f:
+                    summaries = f.read()
+                st.success("Summary generated!")
+                safe_summaries = html.escape(summaries)
+                summary_html = "<div class=\"response-block\"><div class=\"response-label\">Summary</div><div class=\"response-content\">{}</div></div>".format(safe_summaries)
+
+                st.markdown(summary_html, unsafe_allow_html=True)
+
+                st.download_button(
+                    label="Download Summary (.txt)",
+                    data=summaries,
+                    file_name="resume_sections.txt",
+                    mime="text/plain"
+                )
+            except FileNotFoundError:
+                st.error("Something went wrong.")
+
+        # Polls the summary job every second while it runs
+        st.fragment(summary_progress, run_every=1.0 if summarizing else None)()
 
     st.markdown("---")
     st.markdown(
@@ -336,7 +520,9 @@ if uploaded_file:
     )
 
     with st.expander("Preview & Select Pages"):
-        doc = fitz.open("temp.pdf")
+        import fitz  # PyMuPDF for PDF preview and page selection (new added feature)
+
+        doc = fitz.open(file_path)
         num_pages = len(doc)
         st.markdown(f"**Total pages:** {num_pages}")
 
@@ -345,9 +531,17 @@ if uploaded_file:
             options=list(range(1, num_pages + 1))
         )
 
+        if page_selection:
+            # Same page images as the answers' best-match previews, rendered once per page
+            for page in page_selection:
+                previews.prefetch(file_path, page - 1)
+            columns = st.columns(3)
+            for column, page in zip(columns, page_selection[:3]):
+                column.image(previews.get(file_path, page - 1), caption="Page {}".format(page))
+
         if page_selection and st.button("Summarize Selected Pages"):
             with st.spinner("Generating summary for selected pages..."):
-                summaries = app.summarize_selected_pages("temp.pdf", [p - 1 for p in page_selection])
+                summaries = app.summarize_selected_pages(file_path, [p - 1 for p in page_selection])
                 full_summary = "\n\n".join(summaries)
                 st.success("Summary generated for selected pages!")
                 safe_full_summary = html.escape(full_summary)
@@ -0,0 +1,156 @@
+"""Unattended bulk ingestion (and summarization) of PDFs, e.g. for nightly jobs.
+
+Every PDF is ingested into its own index, like an upload in the UI; with --summarize,
+its section summary is written to <output-dir>/<name>.txt. A document that fails is
+reported and skipped. A throughput report ends the run; the exit status is 1 if any
+document failed.
+
+Usage: python batch.py docs/ "archive/**/*.pdf" [--workers 2] [--summarize [--hierarchical]]
+                       [--output-dir summaries] [--report report.json]
+"""
+import os
+import sys
+import glob
+import json
+import hashlib
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from startup import timer
+
+# PDFs processed at the same time; model calls are shared fairly by the scheduler either way
+BATCH_WORKERS = int(os.getenv("RAG_BATCH_WORKERS", "2"))
+
+
+def find_pdfs(patterns):
+    """PDF paths from directories (searched recursively) and glob patterns, in order, without duplicates"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "**", "*.pdf"), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        paths.extend(sorted(path for path in matches if path.lower().endswith(".pdf") and os.path.isfile(path)))
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+def summary_paths(paths, output_dir):
+    """<output_dir>/<file name>.txt per PDF. Names used twice are made of the path below the
+    inputs' common directory instead ("x/doc.pdf" -> "x-doc.txt"), and names still clashing
+    get a hash of their path"""
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    root = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ""
+    clashing = {name for name in names if names.count(name) > 1}
+    for i, path in enumerate(paths):
+        if names[i] in clashing:
+            names[i] = os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, "-")
+    for i, path in enumerate(paths):
+        if names.count(names[i]) > 1:
+            names[i] += "-" + hashlib.sha256(path.encode("utf-8")).hexdigest()[:8]
+    # Two summaries written to one file would overwrite each other
+    assert len(set(names)) == len(names), "summary file names are not unique"
+    return {path: os.path.join(output_dir, f"{name}.txt") for path, name in zip(paths, names)}
+
+
+def generated_tokens():
+    """Tokens generated so far by the chat models of this process"""
+    from scheduler import GENERATED_TOKENS
+
+    return sum(sample.value for family in GENERATED_TOKENS.collect() for sample in family.samples
+               if sample.name == "rag_generated_tokens_total")
+
+
+def process(path, args, output_path):
+    from app import LocalRAGApp
+    from scheduler import BATCH, priority
+
+    rag = LocalRAGApp()
+    result = {"path": path}
+    start = time.perf_counter()
+    # Runs next to the UI or API on the same Ollama server: interactive queries go first.
+    # The absolute path names the lineage: same-named PDFs of other folders are not revisions
+    with priority(BATCH):
+        result.update(rag.ingest_document(path, lineage=os.path.abspath(path)))
+    result["ingest_s"] = round(time.perf_counter() - start, 3)
+    if args.summarize:
+        start = time.perf_counter()
+        if args.hierarchical:
+            rag.summarize_hierarchy(path, output_path=output_path)
+        else:
+            rag.summarize_sections(rag.load_document(path), output_path=output_path)
+        result["summary"] = output_path
+        result["summarize_s"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def report(results, failures, seconds, tokens):
+    pages = sum(r["pages"] for r in results)
+    chunks = sum(r["chunks"] for r in results)
+    cached = sum(1 for r in results if r["cached"])
+    lines = [
+        f"{len(results)} documents processed ({cached} already indexed), {len(failures)} failed, in {seconds:.1f}s",
+        f"  pages   {pages:>8}  {pages / seconds:8.1f} pages/s",
+        f"  chunks  {chunks:>8}  {chunks / seconds:8.1f} chunks/s",
+        f"  tokens  {tokens:>8}  {tokens / seconds:8.1f} tokens/s (generated)",
+    ]
+    lines.extend(f"  FAILED {failure['path']}: {failure['error']}" for failure in failures)
+    return "\n".join(lines), {
+        "documents": len(results), "cached": cached, "failed": len(failures), "seconds": round(seconds, 3),
+        "pages": pages, "chunks": chunks, "tokens": tokens,
+        "pages_per_s": round(pages / seconds, 2), "chunks_per_s": round(chunks / seconds, 2),
+        "tokens_per_s": round(tokens / seconds, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="directories (searched recursively) or glob patterns of PDFs")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="documents processed at the same time")
+    parser.add_argument("--summarize", action="store_true", help="write a section summary of every document")
+    parser.add_argument("--hierarchical", action="store_true", help="with --summarize: one summary per section, merged up")
+    parser.add_argument("--output-dir", default="summaries", help="where the summaries are written")
+    parser.add_argument("--report", help="write the results and the throughput report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    paths = find_pdfs(args.paths)
+    if not paths:
+        print("No PDF found.")
+        return 1
+    outputs = summary_paths(paths, args.output_dir)
+    if args.summarize:
+        os.makedirs(args.output_dir, exist_ok=True)
+    with timer.step("import app"):
+        import app
+    import metrics
+
+    print(f"Processing {len(paths)} documents with {args.workers} workers...")
+    tokens_before = generated_tokens()
+    start = time.perf_counter()
+    results = []
+    failures = []
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="batch") as executor:
+        futures = {executor.submit(process, path, args, outputs[path]): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results.append(future.result())
+                print(f"[{len(results) + len(failures)}/{len(paths)}] {path}: done")
+            except Exception as e:
+                failures.append({"path": path, "error": f"{type(e).__name__}: {e}"})
+                print(f"[{len(results) + len(failures)}/{len(paths)}] {path}: FAILED ({e})")
+    seconds = time.perf_counter() - start
+
+    text, totals = report(results, failures, seconds, int(generated_tokens() - tokens_before))
+    print("\n" + text)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"totals": totals, "documents": results, "failures": failures}, f, indent=2)
+    metrics.observe("batch", seconds)
+    metrics.push_async("localrag_batch_job")
+    app.resources.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Chunking time and retrieval quality of the layout chunker against the fixed-size splitters.
+
+A synthetic manual (chapters, bold section headings, paragraphs each stating one fact,
+see benchmarks.synthetic.make_structured_pdf) is chunked two ways:
+
+- recursive: page texts split into 7500-character chunks for retrieval and again into
+  2000-character chunks for summaries (the previous behaviour)
+- layout: one LayoutChunker pass; its paragraph chunks serve retrieval and are merged
+  into section chunks for summaries
+
+Queries ask for the fact of one paragraph. recall_at_k is the share of queries whose
+fact is in one of the top k chunks, with vector search (HashingEmbedding, so no Ollama
+server is needed) and with hybrid search; context_chars is the size of those k chunks,
+i.e. what the chat model has to read.
+paragraphs_cut is the share of paragraphs split across chunks.
+
+Usage: python -m benchmarks.bench_chunking [--chapters 40] [--queries 300] [--k 4] [--no-outline] [--output results.json]
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from langchain_community.vectorstores import Chroma
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app import CHUNK_OVERLAP, CHUNK_SIZE, SUMMARY_CHUNK_SIZE
+from layout_chunker import LayoutChunker
+from pdf_loader import load_pages
+from hybrid import BM25Index, HybridRetriever
+from benchmarks.synthetic import HashingEmbedding, make_structured_pdf
+
+
+def _flat(text):
+    # Page texts keep the PDF's line breaks
+    return " ".join(text.split())
+
+
+def _paragraphs_cut(chunks, facts):
+    texts = [_flat(chunk.page_content) for chunk in chunks]
+    return sum(not any(paragraph in text for text in texts) for _, _, paragraph in facts) / len(facts)
+
+
+def _retrieval(chunks, queries, k, directory):
+    """recall@k and context size of vector search and of hybrid search (the app's default)"""
+    vector_store = Chroma.from_documents(
+        chunks, HashingEmbedding(), collection_name="bench-chunking", persist_directory=directory
+    )
+    bm25 = BM25Index()
+    bm25.add_documents(chunks)
+    retrievers = {
+        "vector": lambda query: vector_store.similarity_search(query, k=k),
+        "hybrid": HybridRetriever(vector_store=vector_store, bm25=bm25, k=k).invoke,
+    }
+    results = {}
+    for name, search in retrievers.items():
+        hits = 0
+        context_chars = 0
+        for query, fact in queries:
+            docs = search(query)[:k]
+            hits += any(fact in _flat(doc.page_content) for doc in docs)
+            context_chars += sum(len(doc.page_content) for doc in docs)
+        results[f"{name}_recall_at_k"] = round(hits / len(queries), 3)
+        results[f"{name}_context_chars"] = round(context_chars / len(queries))
+    return results
+
+
+def _granularity(chunks, facts):
+    return {
+        "chunks": len(chunks),
+        "mean_chars": round(sum(len(chunk.page_content) for chunk in chunks) / max(len(chunks), 1)),
+        "paragraphs_cut": round(_paragraphs_cut(chunks, facts), 3),
+    }
+
+
+def chunk_recursive(path):
+    start = time.perf_counter()
+    pages = load_pages(path, workers=1)
+    loaded = time.perf_counter()
+    retrieval = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP).split_documents(pages)
+    summary = RecursiveCharacterTextSplitter(chunk_size=SUMMARY_CHUNK_SIZE, chunk_overlap=100).split_documents(pages)
+    end = time.perf_counter()
+    return retrieval, summary, {"extract_s": loaded - start, "split_s": end - loaded, "total_s": end - start}
+
+
+def chunk_layout(path):
+    chunker = LayoutChunker()
+    start = time.perf_counter()
+    retrieval = chunker.split(path)
+    split = time.perf_counter()
+    summary = chunker.section_chunks(retrieval)
+    end = time.perf_counter()
+    # Text extraction and splitting are one pass
+    return retrieval, summary, {"extract_s": split - start, "split_s": end - split, "total_s": end - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3, help="chunking runs per strategy (the fastest is kept)")
+    parser.add_argument("--no-outline", action="store_true", help="PDF without a table of contents: headings from the fonts only")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path, facts = make_structured_pdf(os.path.join(tmp, "manual.pdf"), args.chapters, outline=not args.no_outline)
+        rng = random.Random(1)
+        queries = []
+        for _ in range(args.queries):
+            part, fact, _ = facts[rng.randrange(len(facts))]
+            queries.append((f"What is the torque for {part}?", fact))
+        page_count = len(load_pages(path, workers=1))
+
+        for name, chunk in (("recursive", chunk_recursive), ("layout", chunk_layout)):
+            runs = [chunk(path) for _ in range(args.repeat)]
+            retrieval, summary, _ = runs[0]
+            timings = {key: min(run[2][key] for run in runs) for key in runs[0][2]}
+            result = {
+                "chunker": name,
+                "pages": page_count,
+                "chunking_ms_per_page": round(timings["total_s"] * 1000 / page_count, 3),
+                **{key.replace("_s", "_ms"): round(value * 1000, 2) for key, value in timings.items()},
+                "retrieval": {**_granularity(retrieval, facts), **_retrieval(retrieval, queries, args.k, os.path.join(tmp, name))},
+                "summary": _granularity(summary, facts),
+            }
+            results.append(result)
+            r, s = result["retrieval"], result["summary"]
+            print(f"{name:>9}  chunking {result['total_ms']:.1f}ms ({result['chunking_ms_per_page']:.2f}ms/page)\n"
+                  f"           retrieval: {r['chunks']} chunks of {r['mean_chars']} chars, paragraphs cut {r['paragraphs_cut']:.1%}; "
+                  f"recall@{args.k} vector {r['vector_recall_at_k']:.3f} / hybrid {r['hybrid_recall_at_k']:.3f}, "
+                  f"context {r['hybrid_context_chars']} chars\n"
+                  f"           summary: {s['chunks']} chunks of {s['mean_chars']} chars, paragraphs cut {s['paragraphs_cut']:.1%}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "chunking", "chapters": args.chapters, "outline": not args.no_outline,
+                       "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
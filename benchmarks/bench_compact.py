@@ -0,0 +1,163 @@
+"""Memory, open time, latency and recall of the Chroma index against its compact copies.
+
+Synthetic clustered vectors stand in for embeddings (384 dimensions, like
+bge-small-en-v1.5). The same rows are written to a Chroma index and to float16 and
+int8 CompactVectorStores; every store is then opened and queried in a fresh process,
+so resident memory and open time are those of a cold start. rss_mb counts the pages of
+mapped files too (the OS can drop them under pressure); anon_mb only the process's own memory.
+
+recall_vs_chroma is the share of Chroma's top k found by the store;
+recall_exact the share of the exact (brute-force float32) top k.
+
+Usage: python -m benchmarks.bench_compact [--chunks 20000] [--queries 200] [--k 4] [--output results.json]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+STORES = ("chroma", "float16", "int8")
+CHROMA_BATCH = 5000
+
+
+def _memory_mb():
+    """Resident memory of this process: (total, anonymous i.e. not backed by mapped files)"""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["RssAnon"].split()[0]) / 1024
+    except (OSError, KeyError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return rss, rss
+
+
+def make_vectors(count, dim, clusters=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=count)] + 0.6 * rng.normal(size=(count, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def _measure(store, directory, queries, k):
+    """Runs in a fresh process: open the store, query it, report memory and timings"""
+    import chromadb  # noqa: F401 (imported by Chroma() otherwise, and counted as its memory)
+    from langchain_community.vectorstores import Chroma
+    from compact_index import CompactVectorStore
+
+    # Start the BLAS threads (and their buffers) before measuring
+    np.ones((256, 256), dtype=np.float32) @ np.ones(256, dtype=np.float32)
+    rss_before, anon_before = _memory_mb()
+    start = time.perf_counter()
+    if store == "chroma":
+        index = Chroma(collection_name="bench-compact", persist_directory=directory)
+        # Chroma returns (document, distance) despite the name
+        search = index.similarity_search_by_vector_with_relevance_scores
+    else:
+        index = CompactVectorStore(directory, embedding=None)
+        search = index.similarity_search_by_vector_with_score
+    open_ms = (time.perf_counter() - start) * 1000
+
+    rows = []
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        results = search(query, k=k)
+        timings.append((time.perf_counter() - start) * 1000)
+        rows.append([doc.metadata["row"] for doc, _ in results])
+    sorted_timings = sorted(timings)
+    rss, anon = _memory_mb()
+    return {
+        "store": store,
+        "open_ms": round(open_ms, 2),
+        "first_query_ms": round(timings[0], 2),
+        "mean_ms": round(sum(timings[1:]) / max(len(timings) - 1, 1), 3),
+        "p95_ms": round(sorted_timings[int(len(sorted_timings) * 0.95) - 1], 3),
+        "rss_mb": round(rss - rss_before, 1),
+        "anon_mb": round(anon - anon_before, 1),
+        "rows": rows,
+    }
+
+
+def _disk_mb(directory):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+    ) / (1024 * 1024)
+
+
+def _recall(found, expected):
+    return sum(len(set(f) & set(e)) for f, e in zip(found, expected)) / sum(len(e) for e in expected)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    from langchain_community.vectorstores import Chroma
+    from compact_index import CompactVectorStore
+
+    vectors = make_vectors(args.chunks, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(args.chunks, size=args.queries)] + 0.3 * rng.normal(size=(args.queries, args.dim))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    distances = (queries ** 2).sum(axis=1)[:, None] + (vectors ** 2).sum(axis=1)[None, :] - 2 * queries @ vectors.T
+    exact = [list(np.argsort(row)[:args.k]) for row in distances]
+
+    texts = [f"chunk {i}" for i in range(args.chunks)]
+    metadatas = [{"row": i} for i in range(args.chunks)]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        directories = {store: os.path.join(tmp, store) for store in STORES}
+        start = time.perf_counter()
+        chroma = Chroma(collection_name="bench-compact", persist_directory=directories["chroma"])
+        for first in range(0, args.chunks, CHROMA_BATCH):
+            last = min(first + CHROMA_BATCH, args.chunks)
+            chroma._collection.add(
+                ids=[str(i) for i in range(first, last)],
+                embeddings=vectors[first:last].tolist(),
+                documents=texts[first:last],
+                metadatas=metadatas[first:last],
+            )
+        build_s = {"chroma": time.perf_counter() - start}
+        del chroma
+        for store in STORES[1:]:
+            start = time.perf_counter()
+            CompactVectorStore.build(directories[store], store, vectors, texts, metadatas)
+            build_s[store] = time.perf_counter() - start
+
+        context = multiprocessing.get_context("spawn")
+        for store in STORES:
+            with context.Pool(1) as pool:
+                result = pool.apply(_measure, (store, directories[store], queries.tolist(), args.k))
+            result["build_s"] = round(build_s[store], 2)
+            result["disk_mb"] = round(_disk_mb(directories[store]), 1)
+            results.append(result)
+
+    chroma_rows = results[0]["rows"]
+    for result in results:
+        rows = result.pop("rows")
+        result["recall_vs_chroma"] = round(_recall(rows, chroma_rows), 4)
+        result["recall_exact"] = round(_recall(rows, exact), 4)
+        print(f"{result['store']:>8}  rss +{result['rss_mb']:.1f}MB (anon +{result['anon_mb']:.1f}MB)  disk {result['disk_mb']:.1f}MB  "
+              f"open {result['open_ms']:.1f}ms  first query {result['first_query_ms']:.1f}ms  "
+              f"mean {result['mean_ms']:.2f}ms  p95 {result['p95_ms']:.2f}ms  "
+              f"recall@{args.k} vs chroma {result['recall_vs_chroma']:.3f}  exact {result['recall_exact']:.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "compact", "chunks": args.chunks, "dim": args.dim, "k": args.k,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Query latency of corpus mode as the number of documents grows.
+
+Documents are synthetic and embedded with a deterministic fake embedding of the same
+dimension as bge-small (384), so no Ollama server is needed.
+
+Usage: python -m benchmarks.bench_corpus [--documents 10 100 1000] [--pages 5] [--output results.json]
+"""
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app import CHUNK_OVERLAP, CHUNK_SIZE
+from corpus import Corpus
+from benchmarks.synthetic import make_pages
+
+
+def _latencies(retriever, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        retriever.invoke(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--pages", type=int, default=5, help="pages per document")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = Corpus(tmp, DeterministicFakeEmbedding(size=384), CHUNK_SIZE, CHUNK_OVERLAP)
+        doc_ids = []
+        for target in sorted(args.documents):
+            start = time.perf_counter()
+            while len(doc_ids) < target:
+                doc_id = f"doc{len(doc_ids):05d}"
+                corpus.add_pages(doc_id, make_pages(len(doc_ids), args.pages), {"filename": f"{doc_id}.pdf"})
+                doc_ids.append(doc_id)
+            add_seconds = time.perf_counter() - start
+
+            queries = [f"PN-{rng.randrange(target):05d}-{rng.randrange(args.pages):03d} torque" for _ in range(args.queries)]
+            result = {
+                "documents": target,
+                "chunks": corpus.vector_db._collection.count(),
+                "add_s": round(add_seconds, 2),
+                "all_documents": _latencies(corpus.retriever(), queries),
+                "one_document": _latencies(corpus.retriever(doc_ids=[rng.choice(doc_ids)]), queries),
+                "ten_documents": _latencies(corpus.retriever(doc_ids=rng.sample(doc_ids, min(10, target))), queries),
+            }
+            results.append(result)
+            print(f"{target:>6} docs ({result['chunks']} chunks)  "
+                  f"all p50 {result['all_documents']['p50_ms']}ms p95 {result['all_documents']['p95_ms']}ms  "
+                  f"1 doc p50 {result['one_document']['p50_ms']}ms  "
+                  f"10 docs p50 {result['ten_documents']['p50_ms']}ms")
+
+        # Removing a single document does not touch the others
+        start = time.perf_counter()
+        corpus.remove_document(doc_ids[0])
+        print(f"remove one document: {(time.perf_counter() - start) * 1000:.1f}ms")
+        corpus.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "corpus", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare PyMuPDFLoader with the process-pool extractor (pdf_loader.load_pages).
+
+Usage: python -m benchmarks.bench_extract [--pages 10 100 1000] [--workers N] [--output results.json]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+from langchain_community.document_loaders import PyMuPDFLoader
+
+from pdf_loader import EXTRACT_WORKERS, load_pages
+from benchmarks.synthetic import make_pdf
+
+
+def _best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Start the worker processes once, like a long-running app would
+        load_pages(make_pdf(os.path.join(tmp, "warmup.pdf"), 100), workers=args.workers)
+
+        for pages in args.pages:
+            path = make_pdf(os.path.join(tmp, f"doc_{pages}.pdf"), pages)
+            baseline, expected = _best_of(args.repeat, lambda: PyMuPDFLoader(path).load())
+            parallel, docs = _best_of(args.repeat, lambda: load_pages(path, workers=args.workers))
+
+            assert [d.page_content for d in docs] == [d.page_content for d in expected]
+            assert [d.metadata["page"] for d in docs] == [d.metadata["page"] for d in expected]
+            results.append({
+                "pages": pages,
+                "workers": args.workers,
+                "pymupdf_loader_s": round(baseline, 4),
+                "process_pool_s": round(parallel, 4),
+                "speedup": round(baseline / parallel, 2),
+            })
+            print(f"{pages:>6} pages  PyMuPDFLoader {baseline:8.3f}s  "
+                  f"process pool {parallel:8.3f}s  x{baseline / parallel:.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "extract", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
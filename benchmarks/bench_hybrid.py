@@ -0,0 +1,106 @@
+"""Offline relevance and latency of vector, BM25 and hybrid retrieval.
+
+A synthetic manual is indexed (one page per part number). Queries ask about a part
+number in natural language; the page holding that part number is the relevant one.
+Embeddings come from benchmarks.synthetic.HashingEmbedding, so no Ollama server is needed.
+
+It also checks that an identifier found by BM25 on a single page, which the vector search
+misses, is still among the hybrid results (exit status 1 otherwise).
+
+Usage: python -m benchmarks.bench_hybrid [--pages 500] [--queries 200] [--k 4] [--output results.json]
+"""
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from langchain_community.vectorstores import Chroma
+
+from hybrid import BM25Index, HybridRetriever
+from benchmarks.synthetic import HashingEmbedding, WORDS, make_pages
+
+
+def _evaluate(name, search, queries, k):
+    hits = 0
+    timings = []
+    for query, relevant_page in queries:
+        start = time.perf_counter()
+        docs = search(query)[:k]
+        timings.append((time.perf_counter() - start) * 1000)
+        hits += any(doc.metadata.get("page") == relevant_page for doc in docs)
+    timings.sort()
+    return {
+        "retriever": name,
+        "recall_at_k": round(hits / len(queries), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+    }
+
+
+def lone_identifier_check(k):
+    """True if BM25's only hit survives fusion when the vector search does not return it"""
+    pages = make_pages(1, 10)
+    pages[-1].page_content += "\n\nReplace the seal with kit ZX-4471."
+    bm25 = BM25Index()
+    bm25.add_documents(pages)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Indexed without the page: the embedding "blurs" the identifier completely
+        vector_store = Chroma.from_documents(
+            pages[:-1], HashingEmbedding(), collection_name="bench-hybrid-lone", persist_directory=tmp
+        )
+        hybrid = HybridRetriever(vector_store=vector_store, bm25=bm25, k=k)
+        return any("ZX-4471" in doc.page_content for doc in hybrid.invoke("Which kit is ZX-4471?"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(1)
+    pages = make_pages(0, args.pages, words_per_page=300)
+    queries = []
+    for _ in range(args.queries):
+        page = rng.randrange(args.pages)
+        words = " ".join(rng.sample(WORDS, 3))
+        queries.append((f"What is the {words} for part PN-00000-{page:03d}?", page))
+
+    bm25 = BM25Index()
+    bm25.add_documents(pages)
+    with tempfile.TemporaryDirectory() as tmp:
+        vector_store = Chroma.from_documents(
+            pages, HashingEmbedding(), collection_name="bench-hybrid", persist_directory=tmp
+        )
+        hybrid = HybridRetriever(vector_store=vector_store, bm25=bm25, k=args.k)
+        results = [
+            _evaluate("vector", lambda q: vector_store.similarity_search(q, k=args.k), queries, args.k),
+            _evaluate("bm25", lambda q: [doc for doc, _ in bm25.search(q, args.k)], queries, args.k),
+            _evaluate("hybrid", hybrid.invoke, queries, args.k),
+        ]
+
+    baseline = results[0]
+    for result in results:
+        extra_ms = result["mean_ms"] - baseline["mean_ms"]
+        gain = result["recall_at_k"] - baseline["recall_at_k"]
+        result["recall_gain_per_ms"] = round(gain / extra_ms, 4) if extra_ms > 0 else None
+        print(f"{result['retriever']:>7}  recall@{args.k} {result['recall_at_k']:.3f}  "
+              f"mean {result['mean_ms']:.2f}ms  p95 {result['p95_ms']:.2f}ms  "
+              f"gain/ms {result['recall_gain_per_ms']}")
+
+    lone_hit = lone_identifier_check(args.k)
+    print(f"lone identifier hit kept by hybrid: {lone_hit}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "hybrid", "pages": args.pages, "k": args.k, "results": results,
+                       "lone_identifier_hit": lone_hit}, f, indent=2)
+    if not lone_hit:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
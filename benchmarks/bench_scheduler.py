@@ -0,0 +1,108 @@
+"""Interactive question latency while a batch summarization job saturates the model.
+
+The model is simulated: it serves --parallel requests at a time (like OLLAMA_NUM_PARALLEL),
+queues the rest in arrival order and takes --generation-ms per request. Batch workers
+call it back to back while questions arrive at random; both runs use the same load,
+first calling the model directly, then through scheduler.Scheduler.
+
+Usage: python -m benchmarks.bench_scheduler [--parallel 4] [--batch-workers 8] [--questions 50] [--output results.json]
+"""
+import json
+import time
+import random
+import argparse
+import threading
+
+from langchain_core.runnables import RunnableLambda
+
+from scheduler import BATCH, PrioritySemaphore, Scheduler, ScheduledRunnable, priority
+
+
+def simulated_model(parallel, generation_s):
+    # One priority class: plain arrival order, like the Ollama server queue
+    slots = PrioritySemaphore(parallel, name="simulated")
+
+    def generate(prompt):
+        slots.acquire()
+        try:
+            time.sleep(generation_s)
+        finally:
+            slots.release()
+        return "summary"
+    return RunnableLambda(generate)
+
+
+def _run(llm, args):
+    stop = threading.Event()
+    batch_done = [0]
+
+    def batch_worker():
+        with priority(BATCH):
+            while not stop.is_set():
+                llm.invoke("chunk")
+                batch_done[0] += 1
+
+    workers = [threading.Thread(target=batch_worker) for _ in range(args.batch_workers)]
+    for worker in workers:
+        worker.start()
+
+    rng = random.Random(1)
+    latencies = []
+    lock = threading.Lock()
+
+    def question():
+        start = time.perf_counter()
+        llm.invoke("question")
+        with lock:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    askers = []
+    for _ in range(args.questions):
+        time.sleep(rng.expovariate(1 / (args.interval_ms / 1000)))
+        asker = threading.Thread(target=question)
+        asker.start()
+        askers.append(asker)
+    for asker in askers:
+        asker.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    latencies.sort()
+    return {
+        "p50_ms": round(latencies[len(latencies) // 2], 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+        "batch_per_s": round(batch_done[0] / elapsed, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--batch-workers", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--interval-ms", type=float, default=100)
+    parser.add_argument("--generation-ms", type=float, default=50)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    model = simulated_model(args.parallel, args.generation_ms / 1000)
+    results = []
+    for mode, llm in (
+        ("direct", model),
+        ("scheduled", ScheduledRunnable(model, "model", Scheduler(concurrency=args.parallel, reserve=1))),
+    ):
+        result = {"mode": mode, **_run(llm, args)}
+        results.append(result)
+        print(f"{mode:>9}  question p50 {result['p50_ms']:.1f}ms  p95 {result['p95_ms']:.1f}ms  "
+              f"batch {result['batch_per_s']:.1f} calls/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "scheduler", "parallel": args.parallel, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""End-to-end benchmarks of LocalRAGApp against the stub Ollama server, fully offline.
+
+For a synthetic PDF of each --pages size, measures load_document, create_vector_db,
+query (through stream_answer, answer cache disabled), summarize_sections and
+summarize_selected_pages. Every run starts from an empty cache directory.
+
+With --repeat, each size is run that many times (on PDFs of different text, so caches
+do not help) and the median of every scenario is kept.
+
+Results are written as JSON with --output; --compare checks them against an earlier
+run and exits with status 1 when a scenario got slower by more than --max-regression
+and by more than --regression-floor-ms: timings of a few milliseconds on a shared
+machine vary by more than any relative threshold.
+
+Usage: python -m benchmarks.run [--pages 10 100] [--queries 20] [--repeat 1] [--output results.json]
+                                [--compare baseline.json] [--max-regression 0.25] [--regression-floor-ms 50]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks.stub_ollama import StubOllama
+from benchmarks.synthetic import make_pdf
+
+LOWER_IS_BETTER = {"s", "ms"}
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)]
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _result(scenario, pages, value, unit, **extra):
+    return {"scenario": scenario, "pages": pages, "value": round(value, 4), "unit": unit, **extra}
+
+
+def _milliseconds(result):
+    return result["value"] * 1000 if result["unit"] == "s" else result["value"]
+
+
+def _medians(runs):
+    """Per scenario, the result of the run with the median value"""
+    return [sorted(results, key=lambda r: r["value"])[len(results) // 2] for results in zip(*runs)]
+
+
+def bench_document(app_module, pdf_path, pages, args, work_dir):
+    from answer_cache import SemanticAnswerCache
+
+    rag = app_module.LocalRAGApp()
+    # Every question must reach the model: a similarity above 2 never happens
+    rag.answer_cache = SemanticAnswerCache(threshold=2.0)
+    results = []
+
+    start = time.perf_counter()
+    data = rag.load_document(pdf_path)
+    seconds = time.perf_counter() - start
+    results.append(_result("load_document", pages, seconds, "s", pages_per_s=round(pages / seconds, 1)))
+
+    stats_before = rag.get_embeddings().stats.copy()
+    start = time.perf_counter()
+    rag.create_vector_db(data)
+    seconds = time.perf_counter() - start
+    chunks = (rag.embeddings.stats - stats_before).embedded
+    results.append(_result("create_vector_db", pages, seconds, "s", chunks=chunks, chunks_per_s=round(chunks / seconds, 1)))
+
+    rag.setup_retrieval_chain()
+    rng = random.Random(pages)
+    first_tokens = []
+    totals = []
+    for _ in range(args.queries):
+        page = rng.randrange(pages)
+        for _chunk in rag.stream_answer(f"What does the manual say about part PN-{page:05d}-A?"):
+            pass
+        first_tokens.append(rag.last_query_stats["time_to_first_token_s"] * 1000)
+        totals.append(rag.last_query_stats["total_s"] * 1000)
+    results.append(_result(
+        "query", pages, _percentile(totals, 0.95), "ms",
+        p50_ms=round(_percentile(totals, 0.5), 1),
+        first_token_p50_ms=round(_percentile(first_tokens, 0.5), 1),
+        first_token_p95_ms=round(_percentile(first_tokens, 0.95), 1),
+    ))
+
+    start = time.perf_counter()
+    rag.summarize_sections(data, output_path=os.path.join(work_dir, f"sections_{pages}.txt"))
+    seconds = time.perf_counter() - start
+    results.append(_result("summarize_sections", pages, seconds, "s"))
+
+    selected = list(range(min(pages, 10)))  # 0-based page numbers
+    start = time.perf_counter()
+    rag.summarize_selected_pages(pdf_path, selected, output_path=os.path.join(work_dir, f"pages_{pages}.txt"))
+    seconds = time.perf_counter() - start
+    results.append(_result("summarize_selected_pages", pages, seconds, "s", selected_pages=len(selected)))
+    return results
+
+
+def compare(results, baseline, max_regression, floor_ms=0.0):
+    """Print the change of every scenario against baseline; return the regressed ones"""
+    previous = {(r["scenario"], r["pages"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for result in results:
+        before = previous.get((result["scenario"], result["pages"]))
+        if not before or not before["value"]:
+            continue
+        change = result["value"] / before["value"] - 1
+        if result["unit"] not in LOWER_IS_BETTER:
+            change = -change
+        slower_ms = _milliseconds(result) - _milliseconds(before)
+        if result["unit"] not in LOWER_IS_BETTER:
+            slower_ms = floor_ms + 1  # no absolute floor for rates
+        flag = "  REGRESSION" if change > max_regression and slower_ms > floor_ms else ""
+        print(f"{result['scenario']:>26} {result['pages']:>6} pages  "
+              f"{before['value']:.3f} -> {result['value']:.3f}{result['unit']}  ({change:+.0%}){flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size; the median of each scenario is kept")
+    parser.add_argument("--token-rate", type=float, default=1000.0, help="stub model tokens per second")
+    parser.add_argument("--first-token-ms", type=float, default=20.0, help="stub model prompt processing time")
+    parser.add_argument("--embed-ms", type=float, default=1.0, help="stub model time per embedded text")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="results JSON of an earlier run")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed slowdown against --compare (0.25 = 25%%)")
+    parser.add_argument("--regression-floor-ms", type=float, default=50.0,
+                        help="slowdowns smaller than this are never regressions")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir, \
+            StubOllama(token_rate=args.token_rate, first_token_ms=args.first_token_ms, embed_ms=args.embed_ms) as stub:
+        # Set before importing the app: its configuration is read at import time
+        os.environ["OLLAMA_BASE_URL"] = stub.base_url
+        os.environ["RAG_CACHE_DIR"] = os.path.join(work_dir, "cache")
+        import app as app_module
+
+        results = []
+        for pages in args.pages:
+            runs = []
+            for run in range(args.repeat):
+                pdf_path = make_pdf(os.path.join(work_dir, f"doc_{pages}_{run}.pdf"), pages, seed=pages + 1000 * run)
+                runs.append(bench_document(app_module, pdf_path, pages, args, work_dir))
+            results.extend(_medians(runs))
+
+    print()
+    for result in results:
+        extra = "  ".join(f"{k} {v}" for k, v in result.items() if k not in ("scenario", "pages", "value", "unit"))
+        print(f"{result['scenario']:>26} {result['pages']:>6} pages  {result['value']:.3f}{result['unit']}  {extra}")
+
+    report = {
+        "benchmark": "run",
+        "commit": _commit(),
+        "repeat": args.repeat,
+        "stub": {"token_rate": args.token_rate, "first_token_ms": args.first_token_ms, "embed_ms": args.embed_ms},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.max_regression, args.regression_floor_ms):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
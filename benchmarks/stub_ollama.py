@@ -0,0 +1,165 @@
+"""Stand-in for the Ollama HTTP API, for benchmarks and CI where Ollama cannot run.
+
+Implements the endpoints the app uses: /api/embeddings and /api/embed (deterministic
+HashingEmbedding vectors), /api/chat and /api/generate (streamed pseudo-text), plus
+/api/tags and /api/version. Model speed is configurable: a fixed latency before the
+first token (prompt processing) and a token rate for the rest of the answer.
+
+Usage: python -m benchmarks.stub_ollama [--port 11434] [--token-rate 200] [--first-token-ms 50]
+"""
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import WORDS, HashingEmbedding
+
+
+class StubOllama:
+    """Runs the stub server in a background thread; use as a context manager"""
+
+    def __init__(self, port=0, token_rate=200.0, first_token_ms=50.0, embed_ms=1.0,
+                 answer_tokens=64, embedding_size=384):
+        self.token_rate = token_rate
+        self.first_token_s = first_token_ms / 1000
+        self.embed_s = embed_ms / 1000
+        self.answer_tokens = answer_tokens
+        self.embedding = HashingEmbedding(embedding_size)
+        self.requests = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def embed(self, texts):
+        time.sleep(self.embed_s * len(texts))
+        return self.embedding.embed_documents(texts)
+
+    def answer_tokens_for(self, prompt):
+        """Deterministic answer: the same prompt always gets the same text"""
+        rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+        return [rng.choice(WORDS) + " " for _ in range(self.answer_tokens)]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                stub.count(self.path)
+                if self.path == "/api/tags":
+                    self._json({"models": []})
+                elif self.path == "/api/version":
+                    self._json({"version": "stub"})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                stub.count(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/api/embeddings":
+                    self._json({"embedding": stub.embed([payload.get("prompt", "")])[0]})
+                elif self.path == "/api/embed":
+                    texts = payload.get("input", [])
+                    texts = [texts] if isinstance(texts, str) else texts
+                    self._json({"model": payload.get("model"), "embeddings": stub.embed(texts)})
+                elif self.path == "/api/generate" and "prompt" not in payload:
+                    # Like Ollama: a request without a prompt only loads the model
+                    self._json({"model": payload.get("model"), "response": "", "done": True})
+                elif self.path in ("/api/chat", "/api/generate"):
+                    self._stream(payload)
+                else:
+                    self.send_error(404)
+
+            def _stream(self, payload):
+                chat = self.path == "/api/chat"
+                if chat:
+                    prompt = "".join(str(m.get("content", "")) for m in payload.get("messages", []))
+                else:
+                    prompt = payload.get("prompt", "")
+                tokens = stub.answer_tokens_for(prompt)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+
+                start = time.perf_counter()
+                time.sleep(stub.first_token_s)
+                for i, token in enumerate(tokens):
+                    if i and stub.token_rate:
+                        # Keep to the configured rate whatever the write overhead
+                        delay = stub.first_token_s + i / stub.token_rate - (time.perf_counter() - start)
+                        if delay > 0:
+                            time.sleep(delay)
+                    piece = {"message": {"role": "assistant", "content": token}} if chat else {"response": token}
+                    self._line({"model": payload.get("model"), **piece, "done": False})
+                final = {"message": {"role": "assistant", "content": ""}} if chat else {"response": ""}
+                self._line({
+                    "model": payload.get("model"), **final, "done": True,
+                    "prompt_eval_count": len(prompt) // 4, "eval_count": len(tokens),
+                    "total_duration": int((time.perf_counter() - start) * 1e9),
+                })
+
+            def _line(self, data):
+                self.wfile.write(json.dumps(data).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-rate", type=float, default=200.0, help="generated tokens per second (0: unlimited)")
+    parser.add_argument("--first-token-ms", type=float, default=50.0)
+    parser.add_argument("--embed-ms", type=float, default=1.0, help="per embedded text")
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    stub = StubOllama(args.port, args.token_rate, args.first_token_ms, args.embed_ms, args.answer_tokens)
+    print(f"Stub Ollama listening on {stub.base_url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Synthetic PDF documents for the benchmarks"""
+import os
+import random
+
+import fitz  # PyMuPDF
+
+WORDS = (
+    "pump valve pressure sensor housing clause assembly torque bolt seal gasket "
+    "inspection maintenance interval calibration tolerance flange coupling bearing "
+    "shaft lubrication temperature threshold alarm operator procedure safety"
+).split()
+
+
+def make_pdf(path, pages, words_per_page=350, seed=0):
+    """Write a PDF of the given number of pages filled with deterministic pseudo-text.
+
+    Every page starts with a heading and a part number (e.g. "PN-00042-A") so that
+    exact-match retrieval can be measured too. Returns path.
+    """
+    rng = random.Random(seed)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with fitz.open() as doc:
+        for page_num in range(pages):
+            page = doc.new_page()
+            body = " ".join(rng.choice(WORDS) for _ in range(words_per_page))
+            text = f"Section {page_num + 1}\nPart number PN-{page_num:05d}-A\n\n{body}"
+            page.insert_textbox(fitz.Rect(50, 50, 545, 792), text, fontsize=9)
+        doc.save(path)
+    return path
+
+
+def make_pages(doc_index, pages, words_per_page=350, source=None):
+    """Page Documents shaped like pdf_loader.iter_pages output, without writing a PDF"""
+    from langchain_core.documents import Document
+
+    rng = random.Random(doc_index)
+    source = source or f"doc_{doc_index:05d}.pdf"
+    documents = []
+    for page_num in range(pages):
+        body = " ".join(rng.choice(WORDS) for _ in range(words_per_page))
+        text = f"Section {page_num + 1}\nPart number PN-{doc_index:05d}-{page_num:03d}\n\n{body}"
+        metadata = {"source": source, "file_path": source, "page": page_num, "total_pages": pages}
+        documents.append(Document(page_content=text, metadata=metadata))
+    return documents
+
+
+class HashingEmbedding:
+    """Deterministic bag-of-words embedding (hashed token counts, L2-normalized).
+
+    Stands in for the Ollama embedding model offline: unlike a random fake embedding,
+    texts sharing words get similar vectors, so retrieval quality can be measured.
+    """
+
+    def __init__(self, size=384):
+        self.size = size
+
+    def _embed(self, text):
+        import re
+        import zlib
+        import math
+
+        vector = [0.0] * self.size
+        for token in re.findall(r"\w+", text.lower()):
+            vector[zlib.crc32(token.encode("utf-8")) % self.size] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def make_structured_pdf(path, chapters, sections=3, paragraphs=4, words_per_paragraph=70, seed=0, outline=True):
+    """Write a PDF laid out like a manual: chapters, sections and paragraphs.
+
+    Chapter headings are set large, section headings in bold, body text at 9pt; with
+    outline, the chapters and sections are also in the PDF's table of contents. Each
+    paragraph states one fact ("The torque for PN-00042-A is 57 Nm."). Returns
+    (path, facts): facts holds (part number, fact, paragraph text) per paragraph, in order.
+    """
+    import textwrap
+
+    rng = random.Random(seed)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    facts = []
+    toc = []
+    with fitz.open() as doc:
+        page = None
+        y = 0
+
+        def write(lines, fontsize, fontname, gap):
+            nonlocal page, y
+            height = len(lines) * fontsize * 1.3 + gap
+            if page is None or y + height > 790:
+                page = doc.new_page()
+                y = 60
+            for line in lines:
+                y += fontsize * 1.3
+                page.insert_text((50, y), line, fontsize=fontsize, fontname=fontname)
+            y += gap
+            return doc.page_count
+
+        for chapter in range(chapters):
+            title = f"Chapter {chapter + 1}: {rng.choice(WORDS).title()} {rng.choice(WORDS)}"
+            toc.append([1, title, write([title], 16, "helv", 10)])
+            for section in range(sections):
+                title = f"{chapter + 1}.{section + 1} {rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(WORDS)}"
+                toc.append([2, title, write([title], 10, "hebo", 6)])
+                for _ in range(paragraphs):
+                    part = f"PN-{len(facts):05d}-A"
+                    words = [rng.choice(WORDS) for _ in range(words_per_paragraph)]
+                    fact = f"The torque for {part} is {rng.randint(10, 99)} Nm."
+                    words.insert(rng.randrange(len(words)), fact)
+                    text = " ".join(words)
+                    text = text[0].upper() + text[1:] + "."
+                    write(textwrap.wrap(text, 100), 9, "helv", 8)
+                    facts.append((part, fact, text))
+        if outline:
+            doc.set_toc(toc)
+        doc.save(path)
+    return path, facts
@@ -0,0 +1,145 @@
+import os
+import json
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+# Vectors searched at query time: "chroma" (the store itself), "float16" or "int8" (compact copy)
+VECTOR_FORMAT = os.getenv("RAG_VECTOR_FORMAT", "chroma")
+# Candidates per result re-scored with the exact float32 vectors (0 keeps the approximate order)
+COMPACT_RERANK = int(os.getenv("RAG_COMPACT_RERANK", "4"))
+COMPACT_FORMATS = ("float16", "int8")
+# Rows converted to float32 at a time while scanning: blocks stay in the CPU cache, and a
+# search never holds a float32 copy of the index
+SCAN_BLOCK_ROWS = 1024
+
+
+def compact_directory(index_directory, vector_format):
+    return os.path.join(index_directory, f"compact-{vector_format}")
+
+
+class CompactVectorStore(VectorStore):
+    """Read-only, memory-mapped copy of a complete Chroma index with quantized vectors.
+
+    Files of the directory:
+        vectors.npy     float16 vectors, or int8 vectors scaled per row by scales.npy
+        norms.npy       squared norms of the exact vectors
+        exact.npy       float32 vectors, read only for the candidates being re-ranked
+        documents.jsonl [text, metadata] per row, located through offsets.npy
+
+    A search scans the quantized vectors with NumPy, keeps k * rerank candidates and
+    re-scores them exactly. Scores are squared L2 distances like Chroma's, so the
+    store can stand in for it (lower is closer). Only the pages actually read are
+    loaded by the OS: resident memory stays far below a float32 in-memory index.
+    documents.jsonl is opened for each search, so the store holds no file handle and
+    chains built on it keep working after the registry has evicted it.
+    """
+
+    def __init__(self, directory, embedding, rerank=COMPACT_RERANK):
+        self.directory = directory
+        self.embedding = embedding
+        self.rerank = rerank
+        with open(os.path.join(directory, "compact.json"), "r", encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(directory, "scales.npy")) if self.info["format"] == "int8" else None
+        self.norms = np.load(os.path.join(directory, "norms.npy"))
+        self.exact = np.load(os.path.join(directory, "exact.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"))
+
+    def __len__(self):
+        return len(self.norms)
+
+    @classmethod
+    def build(cls, directory, vector_format, embeddings, texts, metadatas):
+        """Write a compact index of the given rows (embeddings as a float32 matrix)"""
+        if vector_format not in COMPACT_FORMATS:
+            raise ValueError(f"Unknown compact vector format {vector_format!r}, expected one of {COMPACT_FORMATS}")
+        os.makedirs(directory, exist_ok=True)
+        exact = np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1) if len(texts) else np.zeros((0, 0), np.float32)
+        if vector_format == "int8":
+            # Symmetric per-row quantization: row = scale * int8 values
+            scales = np.abs(exact).max(axis=1, initial=0.0) / 127.0
+            scales[scales == 0] = 1.0
+            vectors = np.round(exact / scales[:, None]).astype(np.int8)
+            np.save(os.path.join(directory, "scales.npy"), scales.astype(np.float32))
+        else:
+            vectors = exact.astype(np.float16)
+        np.save(os.path.join(directory, "vectors.npy"), vectors)
+        np.save(os.path.join(directory, "exact.npy"), exact)
+        np.save(os.path.join(directory, "norms.npy"), np.einsum("ij,ij->i", exact, exact))
+
+        offsets = []
+        with open(os.path.join(directory, "documents.jsonl"), "wb") as f:
+            for text, metadata in zip(texts, metadatas):
+                offsets.append(f.tell())
+                f.write(json.dumps([text, metadata or {}], ensure_ascii=False).encode("utf-8") + b"\n")
+        np.save(os.path.join(directory, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        # Written last: a directory without it is an interrupted build
+        with open(os.path.join(directory, "compact.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": vector_format, "count": len(texts), "dim": exact.shape[1]}, f)
+
+    @classmethod
+    def from_chroma(cls, directory, vector_format, vector_db, embedding):
+        """Build (once) and open the compact copy of a complete Chroma index"""
+        if not os.path.exists(os.path.join(directory, "compact.json")):
+            stored = vector_db.get(include=["embeddings", "documents", "metadatas"])
+            cls.build(directory, vector_format, stored["embeddings"], stored["documents"], stored["metadatas"])
+        return cls(directory, embedding)
+
+    def _approximate_distances(self, query):
+        distances = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), SCAN_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            distances[start:start + len(block)] = block @ query
+        if self.scales is not None:
+            distances *= self.scales
+        # |q - v|^2 = |q|^2 + |v|^2 - 2 q.v
+        return float(query @ query) + self.norms - 2 * distances
+
+    def _documents(self, rows):
+        documents = []
+        with open(os.path.join(self.directory, "documents.jsonl"), "rb") as f:
+            for row in rows:
+                f.seek(int(self.offsets[row]))
+                text, metadata = json.loads(f.readline())
+                documents.append(Document(page_content=text, metadata=metadata))
+        return documents
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        if not len(self):
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        distances = self._approximate_distances(query)
+        fetch = min(len(self), k * max(self.rerank, 1))
+        rows = np.argpartition(distances, fetch - 1)[:fetch] if fetch < len(self) else np.arange(len(self))
+        if self.rerank:
+            # Sorted rows read the exact vectors mostly sequentially
+            rows = np.sort(rows)
+            difference = np.asarray(self.exact[rows]) - query
+            scores = np.einsum("ij,ij->i", difference, difference)
+        else:
+            scores = distances[rows]
+        best = np.argsort(scores)[:k]
+        return list(zip(self._documents(rows[best]), scores[best].tolist()))
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("CompactVectorStore is read-only: add documents to the Chroma index")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Build a CompactVectorStore with CompactVectorStore.build")
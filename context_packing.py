@@ -0,0 +1,131 @@
+import os
+import re
+
+from hybrid import tokenize
+
+# 0: derived from the retrieval chunk size, see context_budget()
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKENS", "0"))
+CONTEXT_TRIM_SENTENCES = os.getenv("RAG_CONTEXT_TRIM", "0") == "1"
+# The derived budget holds this many whole retrieval chunks, and never less than MIN_CONTEXT_TOKENS
+CONTEXT_WHOLE_CHUNKS = 2
+MIN_CONTEXT_TOKENS = 1500
+# Rough average for English text with llama-style tokenizers; no tokenizer needed
+CHARS_PER_TOKEN = 4
+# Overlaps shorter than this are coincidences, not shared chunk text
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 400
+
+_SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n+|$)")
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def chunk_tokens(chunk_chars):
+    """Tokens of a retrieval chunk of chunk_chars characters"""
+    return -(-chunk_chars // CHARS_PER_TOKEN)
+
+
+def context_budget(chunk_chars, max_tokens=CONTEXT_TOKEN_BUDGET):
+    """Token budget of the prompt context for retrieval chunks of up to chunk_chars characters:
+    max_tokens when set, else enough for CONTEXT_WHOLE_CHUNKS of them"""
+    if max_tokens:
+        return max_tokens
+    return max(MIN_CONTEXT_TOKENS, CONTEXT_WHOLE_CHUNKS * chunk_tokens(chunk_chars))
+
+
+def _overlap(head, tail):
+    """Length of the longest suffix of head that is also a prefix of tail"""
+    for size in range(min(len(head), len(tail), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if head.endswith(tail[:size]):
+            return size
+    return 0
+
+
+def _strip_overlaps(text, kept):
+    """Remove from text what is already in the kept texts (duplicates and chunk_overlap seams)"""
+    for other in kept:
+        if text in other:
+            return ""
+        cut = _overlap(other, text)
+        if cut:
+            text = text[cut:]
+        cut = _overlap(text, other)
+        if cut:
+            text = text[:-cut]
+    return text.strip()
+
+
+def _sentences(text):
+    return [s.strip() for s in _SENTENCE_RE.findall(text) if s.strip()]
+
+
+def _best_sentences(text, terms, budget_chars):
+    """The sentences of text sharing most terms with the question, in their original order"""
+    sentences = _sentences(text)
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-len(terms.intersection(tokenize(sentences[i]))), i),
+    )
+    chosen = []
+    used = 0
+    for i in ranked:
+        if used + len(sentences[i]) + 1 > budget_chars:
+            continue
+        if chosen and not terms.intersection(tokenize(sentences[i])):
+            break
+        chosen.append(i)
+        used += len(sentences[i]) + 1
+    if not chosen:
+        # No sentence fits (e.g. a long table row): keep the beginning
+        return text[:budget_chars].strip()
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def _label(doc):
+    page = doc.metadata.get("page")
+    return f"[Page {page + 1}]" if isinstance(page, int) else "[Excerpt]"
+
+
+def pack_context(docs, question, max_tokens=MIN_CONTEXT_TOKENS, trim_sentences=CONTEXT_TRIM_SENTENCES):
+    """Assemble retrieved documents into a prompt context that fits max_tokens.
+
+    docs are taken in order of relevance (as returned by the retriever). Text already
+    present in a more relevant chunk, such as the chunk_overlap shared by neighbours,
+    is removed. Documents are added whole while they fit; the first one that does not
+    is cut down to its sentences most related to the question. With trim_sentences,
+    every document is cut down that way.
+
+    Returns (context text, stats).
+    """
+    terms = set(tokenize(question))
+    budget_chars = max_tokens * CHARS_PER_TOKEN
+    parts = []
+    kept = []
+    original_chars = 0
+    for doc in docs:
+        label = _label(doc)
+        # What stuffing every document unchanged would have cost
+        original_chars += len(label) + len(doc.page_content) + 3
+        text = _strip_overlaps(doc.page_content, kept)
+        if not text:
+            continue
+        remaining = budget_chars - sum(len(p) + 2 for p in parts) - len(label) - 1
+        if remaining <= 0:
+            break
+        if trim_sentences or len(text) > remaining:
+            text = _best_sentences(text, terms, remaining)
+            if not text:
+                continue
+        kept.append(doc.page_content)
+        parts.append(f"{label}\n{text}")
+
+    context = "\n\n".join(parts)
+    stats = {
+        "retrieved_documents": len(docs),
+        "used_documents": len(parts),
+        "retrieved_tokens": -(-original_chars // CHARS_PER_TOKEN),
+        "context_tokens": estimate_tokens(context),
+    }
+    return context, stats
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from storage import SQLiteStore
+from pdf_loader import file_sha256, iter_pages, iter_windows
+
+CORPUS_COLLECTION = "local-rag-corpus"
+
+
+class Corpus:
+    """Many documents in one persistent Chroma collection.
+
+    Every chunk carries a doc_id metadata field (derived from the PDF content) plus
+    the document-level metadata given when adding it, so retrieval can be scoped to
+    some documents or filtered on metadata, and single documents can be added or
+    removed without touching the others. A manifest of the documents is kept next to
+    the collection.
+    """
+
+    def __init__(self, directory, embeddings, chunk_size, chunk_overlap, window_pages=32, layout_chunker=None):
+        self.directory = directory
+        self.embeddings = embeddings
+        self.window_pages = window_pages
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        # With a LayoutChunker, PDFs are split along their sections and paragraphs instead
+        self.layout_chunker = layout_chunker
+        from langchain_community.vectorstores import Chroma
+
+        self.vector_db = Chroma(
+            collection_name=CORPUS_COLLECTION,
+            embedding_function=embeddings,
+            persist_directory=directory
+        )
+        self.manifest = SQLiteStore(os.path.join(directory, "documents.sqlite3"), table="documents")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def document_id(file_path):
+        return file_sha256(file_path)[:16]
+
+    def add_document(self, file_path, metadata=None):
+        """Index a PDF into the corpus. Returns its doc_id; already indexed documents are skipped"""
+        doc_id = self.document_id(file_path)
+        if self.manifest.get(doc_id) is not None:
+            return doc_id
+        metadata = {"filename": os.path.basename(file_path), **(metadata or {})}
+        if self.layout_chunker is not None:
+            pages = (chunks for _, _, chunks in self.layout_chunker.iter_pages(file_path))
+            self._add_chunks(doc_id, pages, metadata)
+        else:
+            self.add_pages(doc_id, iter_pages(file_path), metadata)
+        return doc_id
+
+    def add_pages(self, doc_id, pages, metadata=None):
+        """Index page Documents under doc_id, streaming them in windows"""
+        self._add_chunks(doc_id, ([page] for page in pages), metadata, split=True)
+
+    def _add_chunks(self, doc_id, pages, metadata, split=False):
+        """Index the chunks of every page (a list of Documents per page), in windows of pages"""
+        metadata = {**(metadata or {}), "doc_id": doc_id}
+        with self._lock:
+            # Drop a previous, interrupted attempt
+            self.vector_db._collection.delete(where={"doc_id": doc_id})
+            page_count = 0
+            chunk_count = 0
+            for window in iter_windows(pages, self.window_pages):
+                chunks = [chunk for page in window for chunk in page]
+                if split:
+                    chunks = self.text_splitter.split_documents(chunks)
+                for chunk in chunks:
+                    chunk.metadata.update(metadata)
+                if chunks:
+                    ids = [f"{doc_id}:{chunk_count + i}" for i in range(len(chunks))]
+                    self.vector_db.add_documents(chunks, ids=ids)
+                page_count += len(window)
+                chunk_count += len(chunks)
+
+            entry = {**metadata, "pages": page_count, "chunks": chunk_count, "added_at": time.time()}
+            self.manifest.put(doc_id, json.dumps(entry).encode("utf-8"))
+
+    def remove_document(self, doc_id):
+        """Delete a document's chunks and manifest entry"""
+        with self._lock:
+            self.vector_db._collection.delete(where={"doc_id": doc_id})
+            self.manifest.delete_many([doc_id])
+
+    def documents(self):
+        """Manifest entries of the indexed documents"""
+        return [json.loads(value) for _, value in self.manifest.items()]
+
+    def version(self):
+        """Identifies the current set of documents; changes whenever one is added or removed"""
+        doc_ids = "\0".join(doc_id for doc_id, _ in self.manifest.items())
+        return hashlib.sha256(doc_ids.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def search_filter(doc_ids=None, where=None):
+        """Chroma metadata filter restricting a search to doc_ids and/or where conditions"""
+        conditions = []
+        if doc_ids:
+            conditions.append({"doc_id": {"$in": list(doc_ids)}})
+        for field, value in (where or {}).items():
+            conditions.append({field: value})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def retriever(self, doc_ids=None, where=None, k=4):
+        search_kwargs = {"k": k}
+        search_filter = self.search_filter(doc_ids, where)
+        if search_filter:
+            search_kwargs["filter"] = search_filter
+        return self.vector_db.as_retriever(search_kwargs=search_kwargs)
+
+    def close(self):
+        self.manifest.close()
@@ -0,0 +1,148 @@
+import os
+import time
+import array
+import hashlib
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+import metrics
+from storage import SQLiteStore
+
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "16"))
+EMBED_CONCURRENCY = int(os.getenv("RAG_EMBED_CONCURRENCY", "4"))
+# Recent query embeddings kept in memory (the answer cache and the retriever embed the same question)
+QUERY_MEMO_SIZE = 1024
+
+
+def _pack(vector):
+    return array.array("f", vector).tobytes()
+
+
+def _unpack(blob):
+    vector = array.array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingStats:
+    """Running counters of an embedding pipeline"""
+
+    def __init__(self):
+        self.texts = 0
+        self.cache_hits = 0
+        self.embedded = 0
+        self.seconds = 0.0
+
+    @property
+    def chunks_per_second(self):
+        return self.texts / self.seconds if self.seconds else 0.0
+
+    @property
+    def hit_rate(self):
+        return self.cache_hits / self.texts if self.texts else 0.0
+
+    def copy(self):
+        stats = EmbeddingStats()
+        stats.__dict__.update(self.__dict__)
+        return stats
+
+    def __sub__(self, other):
+        """Counters accumulated since the other (earlier) snapshot"""
+        stats = EmbeddingStats()
+        for name in ("texts", "cache_hits", "embedded", "seconds"):
+            setattr(stats, name, getattr(self, name) - getattr(other, name))
+        return stats
+
+    def __str__(self):
+        return (
+            f"{self.texts} chunks in {self.seconds:.2f}s "
+            f"({self.chunks_per_second:.1f} chunks/s, cache hit rate {self.hit_rate:.0%})"
+        )
+
+
+class CachedBatchEmbeddings(Embeddings):
+    """Embeddings wrapper that caches vectors per (model, text hash) on disk
+    and embeds cache misses in batches over a bounded pool of concurrent requests.
+    """
+
+    def __init__(self, base, model, cache_path, batch_size=EMBED_BATCH_SIZE,
+                 max_concurrency=EMBED_CONCURRENCY):
+        self.base = base
+        self.model = model
+        self.cache = SQLiteStore(cache_path, table="embeddings")
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.stats = EmbeddingStats()
+        self._stats_lock = threading.Lock()
+        self._queries = OrderedDict()
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _embed_batch(self, texts):
+        return self.base.embed_documents(texts)
+
+    def embed_documents(self, texts):
+        """Embed texts, only sending the ones missing from the cache to the model"""
+        start_time = time.time()
+        keys = [self._key(text) for text in texts]
+        cached = self.cache.get_many(set(keys))
+
+        vectors = [None] * len(texts)
+        missing = {}  # key -> positions of the texts sharing it
+        for i, key in enumerate(keys):
+            if key in cached:
+                vectors[i] = _unpack(cached[key])
+            else:
+                missing.setdefault(key, []).append(i)
+
+        pending = list(missing)
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        if batches:
+            workers = min(self.max_concurrency, len(batches))
+            # Batches run with the caller's context, so they keep its scheduling priority
+            context = contextvars.copy_context()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(
+                    lambda batch: context.copy().run(self._embed_batch, batch),
+                    [[texts[missing[key][0]] for key in batch] for batch in batches],
+                )
+                for batch, batch_vectors in zip(batches, results):
+                    self.cache.put_many(
+                        (key, _pack(vector)) for key, vector in zip(batch, batch_vectors)
+                    )
+                    for key, vector in zip(batch, batch_vectors):
+                        for i in missing[key]:
+                            vectors[i] = vector
+
+        seconds = time.time() - start_time
+        cache_hits = len(texts) - sum(len(positions) for positions in missing.values())
+        with self._stats_lock:
+            self.stats.texts += len(texts)
+            self.stats.cache_hits += cache_hits
+            self.stats.embedded += len(pending)
+            self.stats.seconds += seconds
+        metrics.observe("embed", seconds)
+        metrics.EMBEDDED_TEXTS.labels("cache").inc(cache_hits)
+        metrics.EMBEDDED_TEXTS.labels("model").inc(len(pending))
+        return vectors
+
+    def embed_query(self, text):
+        with self._stats_lock:
+            if text in self._queries:
+                self._queries.move_to_end(text)
+                return self._queries[text]
+        with metrics.timed("embed_query"):
+            vector = self.base.embed_query(text)
+        with self._stats_lock:
+            self._queries[text] = vector
+            if len(self._queries) > QUERY_MEMO_SIZE:
+                self._queries.popitem(last=False)
+        return vector
+
+    def close(self):
+        self.cache.close()
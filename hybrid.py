@@ -0,0 +1,177 @@
+import os
+import re
+import json
+import math
+import heapq
+from collections import Counter
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+HYBRID_K = int(os.getenv("RAG_HYBRID_K", "4"))
+HYBRID_FETCH_K = int(os.getenv("RAG_HYBRID_FETCH_K", "20"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("RAG_HYBRID_VECTOR_WEIGHT", "0.5"))
+HYBRID_BM25_WEIGHT = float(os.getenv("RAG_HYBRID_BM25_WEIGHT", "0.5"))
+
+# Words, numbers and identifiers such as "PN-00042-A", "4.2.1" or "M8x1.25"
+_TOKEN_RE = re.compile(r"[0-9a-z]+(?:[-_./:][0-9a-z]+)*")
+_PART_RE = re.compile(r"[-_./:]")
+
+
+def tokenize(text):
+    """Lowercased terms; compound identifiers are kept whole and also split into their parts"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+def _matches(metadata, search_filter):
+    for field, allowed in (search_filter or {}).items():
+        value = metadata.get(field)
+        if isinstance(allowed, (list, tuple, set)):
+            if value not in allowed:
+                return False
+        elif value != allowed:
+            return False
+    return True
+
+
+class BM25Index:
+    """Compact in-process inverted index scored with Okapi BM25.
+
+    Postings map each term to [doc number, term frequency] pairs. The index is saved
+    as a single JSON file next to the vector index it complements.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = []  # [page_content, metadata]
+        self.lengths = []
+        self.postings = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add_documents(self, documents):
+        for doc in documents:
+            number = len(self.documents)
+            terms = Counter(tokenize(doc.page_content))
+            self.documents.append([doc.page_content, doc.metadata])
+            length = sum(terms.values())
+            self.lengths.append(length)
+            self.total_length += length
+            for term, frequency in terms.items():
+                self.postings.setdefault(term, []).append([number, frequency])
+
+    def search(self, query, k=HYBRID_FETCH_K, search_filter=None):
+        """Return up to k (Document, score) pairs, best first.
+
+        search_filter maps metadata fields to an allowed value or list of values.
+        """
+        count = len(self.documents)
+        if not count:
+            return []
+        average_length = self.total_length / count
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for number, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[number] / average_length)
+                scores[number] = scores.get(number, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        if search_filter:
+            scores = {n: s for n, s in scores.items() if _matches(self.documents[n][1], search_filter)}
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [
+            (Document(page_content=self.documents[n][0], metadata=dict(self.documents[n][1])), score)
+            for n, score in best
+        ]
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "documents": self.documents,
+                "lengths": self.lengths,
+                "postings": self.postings,
+            }, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.documents = data["documents"]
+        index.lengths = data["lengths"]
+        index.postings = data["postings"]
+        index.total_length = sum(index.lengths)
+        return index
+
+
+def _doc_key(doc):
+    return (doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content)
+
+
+def _normalized(scored):
+    """Min-max normalize [(doc, score)] (higher is better) to [0, 1]; equal scores all get 1"""
+    if not scored:
+        return []
+    low = min(score for _, score in scored)
+    high = max(score for _, score in scored)
+    if high == low:
+        return [(doc, 1.0) for doc, _ in scored]
+    return [(doc, (score - low) / (high - low)) for doc, score in scored]
+
+
+def _relative(scored):
+    """Scale [(doc, score)] (non-negative, higher is better) by the best score, so a lone hit keeps 1"""
+    high = max((score for _, score in scored), default=0.0)
+    return [(doc, score / high if high > 0 else 1.0) for doc, score in scored]
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuses vector similarity results with BM25 keyword results.
+
+    Vector scores are min-max normalized and BM25 scores divided by the best one, then
+    combined with the given weights, so a strong exact match on an identifier (part
+    number, clause ID) that embeddings blur wins without having to raise k for the vector
+    search, even when it is the only keyword hit.
+    """
+
+    vector_store: object
+    bm25: object
+    k: int = HYBRID_K
+    fetch_k: int = HYBRID_FETCH_K
+    vector_weight: float = HYBRID_VECTOR_WEIGHT
+    bm25_weight: float = HYBRID_BM25_WEIGHT
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        rankings = []
+        if self.vector_weight > 0:
+            # Chroma returns distances: lower is closer
+            scored = self.vector_store.similarity_search_with_score(query, k=self.fetch_k)
+            rankings.append((self.vector_weight, _normalized([(doc, -distance) for doc, distance in scored])))
+        if self.bm25_weight > 0:
+            rankings.append((self.bm25_weight, _relative(self.bm25.search(query, self.fetch_k))))
+
+        fused = {}
+        documents = {}
+        for weight, scored in rankings:
+            for doc, score in scored:
+                key = _doc_key(doc)
+                documents.setdefault(key, doc)
+                fused[key] = fused.get(key, 0.0) + weight * score
+        best = sorted(fused, key=fused.get, reverse=True)[:self.k]
+        return [documents[key] for key in best]
@@ -0,0 +1,38 @@
+import json
+import time
+import threading
+
+from storage import SQLiteStore
+
+
+class IndexVersions:
+    """Successive indexes of one document lineage (e.g. the revisions of a spec uploaded
+    under the same name), oldest first.
+
+    Every version keeps its own on-disk index; a new revision's index starts from a copy
+    of the latest version built with the same settings.
+    """
+
+    def __init__(self, path):
+        self.store = SQLiteStore(path, table="lineages")
+        self._lock = threading.Lock()
+
+    def versions(self, lineage):
+        value = self.store.get(lineage)
+        return json.loads(value) if value else []
+
+    def add(self, lineage, index_key, document_hash, config, chunks):
+        # Read-modify-write: concurrent ingestions of one lineage must not drop each other's version
+        with self._lock:
+            versions = [v for v in self.versions(lineage) if v["index_key"] != index_key]
+            versions.append({
+                "index_key": index_key,
+                "document_hash": document_hash,
+                "config": config,
+                "chunks": chunks,
+                "created_at": time.time(),
+            })
+            self.store.put(lineage, json.dumps(versions).encode("utf-8"))
+
+    def close(self):
+        self.store.close()
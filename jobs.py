@@ -0,0 +1,150 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Background jobs (ingestion, summaries) running at once; the others wait in line
+JOB_WORKERS = int(os.getenv("RAG_JOB_WORKERS", "2"))
+# Finished jobs kept for status queries, oldest dropped first
+MAX_FINISHED_JOBS = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised by Job.progress once the job is cancelled, to stop the work at its next step"""
+
+
+class Job:
+    """A unit of background work with its progress (done of total, in unit).
+
+    The work reports through progress(done, total), which fits the on_progress callbacks
+    of LocalRAGApp; cancellation takes effect at the next report.
+    """
+
+    def __init__(self, kind, description, unit="pages"):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.description = description
+        self.unit = unit
+        self.status = QUEUED
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.partial_result = None  # usable before the job is done, e.g. a document queryable from its first pages
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    def progress(self, done, total=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def fraction(self):
+        if self.status == DONE:
+            return 1.0
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left at the throughput measured so far (None until the first report)"""
+        if self.status != RUNNING or not self.done or not self.total:
+            return None
+        elapsed = time.time() - self.started_at
+        return elapsed * max(self.total - self.done, 0) / self.done
+
+    def to_dict(self):
+        eta = self.eta
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "description": self.description,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "unit": self.unit,
+            "eta_s": round(eta, 1) if eta is not None else None,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Runs jobs in a worker pool, in submission order, and keeps their status"""
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-job")
+        self.jobs = {}  # job id -> Job, oldest first
+        self._lock = threading.Lock()
+
+    def submit(self, kind, description, fn, unit="pages"):
+        """Queue fn(job); its return value becomes job.result"""
+        job = Job(kind, description, unit)
+        with self._lock:
+            self.jobs[job.id] = job
+            finished = [j.id for j in self.jobs.values() if j.finished]
+            for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self.jobs[job_id]
+        self.executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        job.started_at = time.time()
+        if job.cancel_requested:
+            job.status = CANCELLED
+            job.finished_at = job.started_at
+            return
+        job.status = RUNNING
+        try:
+            job.result = fn(job)
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+            print(f"Job {job.id} ({job.kind}) cancelled.")
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self, kind=None):
+        with self._lock:
+            return [job for job in self.jobs.values() if kind is None or job.kind == kind]
+
+    def cancel(self, job_id):
+        """Ask a job to stop; a queued job never starts. Returns the job, or None if unknown"""
+        job = self.jobs.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel()
+            if job.status == QUEUED:
+                job.status = CANCELLED
+        return job
+
+
+# Shared by every session of the process
+jobs = JobManager()
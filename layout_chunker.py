@@ -0,0 +1,201 @@
+import os
+import re
+from collections import Counter
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from pdf_loader import document_metadata
+
+# "layout": chunks follow the sections and paragraphs of the PDF; "recursive": fixed character windows
+CHUNKER = os.getenv("RAG_CHUNKER", "layout")
+# Largest retrieval chunk: consecutive paragraphs of a section packed together
+PARAGRAPH_CHUNK_CHARS = int(os.getenv("RAG_PARAGRAPH_CHUNK_CHARS", "1500"))
+# Largest summarization chunk: consecutive retrieval chunks of a section merged together
+SECTION_CHUNK_CHARS = int(os.getenv("RAG_SECTION_CHUNK_CHARS", "3000"))
+# A short block set this much larger than the body text is a heading (1.5x: a top-level one)
+HEADING_SIZE_RATIO = 1.15
+TOP_HEADING_SIZE_RATIO = 1.5
+HEADING_MAX_CHARS = 150
+BOLD_FLAG = 16
+# Bumped when the chunks of a PDF change, so that indexes built with the older ones are rebuilt
+LAYOUT_VERSION = "2"
+
+
+def _normalize(text):
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+
+def _read_block(block):
+    """(text, font size of most of its characters, all bold) of a text block of page.get_text("dict")"""
+    lines = []
+    sizes = Counter()
+    bold = True
+    for line in block["lines"]:
+        text = "".join(span["text"] for span in line["spans"]).strip()
+        if text:
+            lines.append(text)
+        for span in line["spans"]:
+            chars = len(span["text"].strip())
+            if chars:
+                sizes[round(span["size"] * 2) / 2] += chars
+                bold = bold and bool(span["flags"] & BOLD_FLAG)
+    size = sizes.most_common(1)[0][0] if sizes else 0.0
+    return " ".join(lines), size, bold
+
+
+def _enter(sections, level, title):
+    while sections and sections[-1][0] >= level:
+        sections.pop()
+    sections.append((level, title))
+
+
+class LayoutChunker:
+    """Splits PDFs along their layout: sections, then paragraphs.
+
+    Headings come from the outline when the PDF has one, and from the fonts otherwise
+    (short blocks set larger than the body text, or in bold); font headings nest under
+    the outline's. Paragraphs are the text blocks of a page. Consecutive paragraphs of a
+    section are packed into chunks of at most paragraph_chars, and longer paragraphs are
+    cut at sentence boundaries. Headings lead the chunk of the body text that follows
+    them, even from the bottom of the previous page; otherwise a chunk never spans two
+    sections or two pages. Its "section" metadata holds the path of its section
+    ("Chapter > Sub-section").
+
+    These paragraph chunks are the retrieval chunks; section_chunks() merges them into
+    the larger chunks summaries are made of, so a document is split only once.
+    """
+
+    def __init__(self, paragraph_chars=PARAGRAPH_CHUNK_CHARS, section_chars=SECTION_CHUNK_CHARS):
+        self.paragraph_chars = paragraph_chars
+        self.section_chars = section_chars
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=paragraph_chars, chunk_overlap=0, separators=["\n\n", "\n", ". ", " ", ""],
+        )
+
+    def config(self):
+        """Settings the retrieval chunks depend on (part of the index key)"""
+        return f"layout{LAYOUT_VERSION}-{self.paragraph_chars}"
+
+    def iter_pages(self, file_path, page_numbers=None):
+        """Lazily yield (page number, page count, chunks of the page) in page order.
+
+        With page_numbers, only those pages are chunked; the outline still places them in their section.
+        """
+        import fitz  # PyMuPDF, imported on first use (slow to import)
+
+        with fitz.open(file_path) as doc:
+            metadata = document_metadata(doc, file_path)
+            outline = {}  # page -> [(level, title)]
+            for level, title, page in doc.get_toc(simple=True):
+                if 0 < page <= len(doc) and title.strip():
+                    outline.setdefault(page - 1, []).append((level, title.strip()))
+            outline_depth = max((level for entries in outline.values() for level, _ in entries), default=0)
+            selected = set(page_numbers) if page_numbers is not None else None
+            sizes = Counter()  # characters per font size so far: the most common one is the body text
+            sections = []  # (level, title) of the current section and its parents
+            headings = []  # headings not followed by body text yet, for the next chunk
+            for page_num in range(len(doc)):
+                if selected is not None and page_num not in selected:
+                    # Their body text is on a page not chunked
+                    headings.clear()
+                    for level, title in outline.get(page_num, []):
+                        _enter(sections, level, title)
+                    continue
+                blocks = []
+                for block in doc[page_num].get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+                    text, size, bold = _read_block(block)
+                    # Page numbers and other bare numbers carry nothing
+                    if text and not text.isdigit():
+                        blocks.append((text, size, bold))
+                        sizes[size] += len(text)
+                page_metadata = {**metadata, "page": page_num}
+                chunks = self._page_chunks(
+                    blocks, outline.get(page_num, []), outline_depth, sizes, sections, headings, page_metadata,
+                )
+                yield page_num, len(doc), chunks
+
+    def _page_chunks(self, blocks, entries, outline_depth, sizes, sections, headings, metadata):
+        body = sizes.most_common(1)[0][0] if sizes else 0.0
+        entries = list(entries)
+        paragraphs = []  # (heading level, 0 for body text; text)
+        for text, size, bold in blocks:
+            level = 0
+            if len(text) <= HEADING_MAX_CHARS:
+                match = next((entry for entry in entries if _normalize(entry[1]) == _normalize(text)), None)
+                if match:
+                    entries.remove(match)
+                    level = match[0]
+                elif size >= body * TOP_HEADING_SIZE_RATIO:
+                    level = outline_depth + 1
+                elif size >= body * HEADING_SIZE_RATIO:
+                    level = outline_depth + 2
+                elif bold and size >= body and not text.endswith((".", ":", ";", ",")):
+                    level = outline_depth + 3
+            paragraphs.append((level, text))
+        # Outline entries whose title is not printed on the page start their section at its top
+        for level, title in entries:
+            _enter(sections, level, title)
+
+        chunks = []
+        current = []
+        length = 0
+
+        def flush():
+            nonlocal current, length
+            if current:
+                section = " > ".join(title for _, title in sections)
+                # Pending headings are not counted in paragraph_chars
+                content = "\n\n".join(headings + current)
+                chunks.append(Document(page_content=content, metadata={**metadata, "section": section}))
+                headings.clear()
+            current = []
+            length = 0
+
+        for level, text in paragraphs:
+            if level:
+                flush()
+                _enter(sections, level, text)
+                headings.append(text)
+                continue
+            if len(text) > self.paragraph_chars:
+                flush()
+                for piece in self.splitter.split_text(text):
+                    current = [piece]
+                    flush()
+                continue
+            if current and length + 2 + len(text) > self.paragraph_chars:
+                flush()
+            current.append(text)
+            length += len(text) + 2
+        # Headings at the bottom of the page stay pending for the first chunk of the next one
+        flush()
+        return chunks
+
+    def split(self, file_path, page_numbers=None):
+        """Retrieval chunks of the PDF (of the given pages only), in order"""
+        return [chunk for _, _, chunks in self.iter_pages(file_path, page_numbers) for chunk in chunks]
+
+    def section_chunks(self, chunks):
+        """Summarization chunks: the paragraphs of consecutive retrieval chunks of a section, packed
+        again up to section_chars. A chunk may continue on the next page and into the first
+        sub-section of its section; its metadata is that of its first part"""
+        merged = []
+        last = None
+        last_section = None
+        last_page = None
+        for chunk in chunks:
+            page = chunk.metadata.get("page")
+            section = chunk.metadata.get("section", "")
+            same_section = (last is not None and page in (last_page, last_page + 1)
+                            and (section == last_section or section.startswith(last_section + " > ")))
+            for paragraph in chunk.page_content.split("\n\n"):
+                if same_section and len(last.page_content) + 2 + len(paragraph) <= self.section_chars:
+                    last.page_content += "\n\n" + paragraph
+                else:
+                    last = Document(page_content=paragraph, metadata=dict(chunk.metadata))
+                    merged.append(last)
+                    same_section = True
+            last_section = section
+            last_page = page
+        return merged
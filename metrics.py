@@ -0,0 +1,91 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram, push_to_gateway, start_http_server
+
+# Port of the /metrics endpoint started by long-lived processes (UI); 0 disables it
+METRICS_PORT = int(os.getenv("RAG_METRICS_PORT", "8000"))
+PUSHGATEWAY_URL = os.getenv("PUSHGATEWAY_URL", "http://localhost:9091")
+
+# From a few milliseconds (cached retrieval) to minutes (summarizing a long document)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Duration of a pipeline stage",
+    ["stage"], buckets=STAGE_BUCKETS,
+)
+STAGE_ERRORS = Counter("rag_stage_errors_total", "Pipeline stages that raised", ["stage"])
+QUERIES = Counter("rag_queries_total", "Questions answered", ["source"])  # source: model or cache
+EMBEDDED_TEXTS = Counter("rag_embedded_texts_total", "Texts embedded", ["source"])  # source: model or cache
+SUMMARY_CHUNKS = Counter("rag_summary_chunks_total", "Chunks summarized", ["outcome"])  # ok, failed or cached
+STARTUP_SECONDS = Gauge("rag_startup_seconds", "Duration of a startup step of this process", ["step"])
+
+_server_lock = threading.Lock()
+_server_port = None
+
+
+def observe(stage, seconds):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+@contextmanager
+def timed(stage):
+    """Record the duration of the block under stage (and count it as an error if it raises)"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def run_listeners(stage):
+    """with_listeners() arguments recording the duration of a runnable under stage"""
+    def on_end(run):
+        observe(stage, (run.end_time - run.start_time).total_seconds())
+
+    def on_error(run):
+        STAGE_ERRORS.labels(stage).inc()
+        on_end(run)
+
+    return {"on_end": on_end, "on_error": on_error}
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """Expose /metrics on port for Prometheus to scrape. Safe to call on every Streamlit rerun"""
+    global _server_port
+    with _server_lock:
+        if _server_port is not None or not port:
+            return
+        try:
+            start_http_server(port)
+        except OSError as e:
+            print(f"⚠️ Could not start the metrics endpoint on port {port}: {e}")
+            return
+        _server_port = port
+        print(f"Metrics available on http://localhost:{port}/metrics")
+
+
+def push_async(job):
+    """Push every metric to the Pushgateway from a background thread.
+
+    For short-lived runs (command line); processes with a /metrics endpoint are scraped instead.
+    """
+    if _server_port is not None:
+        return None
+    gateway = PUSHGATEWAY_URL.replace("http://", "").replace("https://", "")
+
+    def push():
+        try:
+            push_to_gateway(gateway, job=job, registry=REGISTRY)
+            print("✅ Metrics pushed successfully to Pushgateway.")
+        except Exception as e:
+            print(f"⚠️ Could not push metrics: {e}")
+
+    thread = threading.Thread(target=push, name="metrics-push")
+    thread.start()
+    return thread
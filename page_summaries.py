@@ -0,0 +1,39 @@
+import os
+
+from storage import SQLiteStore
+from summary_cache import text_hash
+
+# Summarize every page in the background after upload, so page selections are served at once
+PAGE_SUMMARY_PREFILL = os.getenv("RAG_PAGE_SUMMARY_PREFILL", "1") == "1"
+# Pages summarized per background step; pages selected meanwhile wait at most one step
+PREFILL_BATCH_PAGES = 8
+
+
+class PageSummaryIndex:
+    """Persistent (document, page) -> summary index.
+
+    Entries are keyed by document hash, page number, model and prompt, so a page
+    summary is found without opening the PDF again. Pages without text are stored
+    with an empty summary.
+    """
+
+    def __init__(self, path):
+        self.store = SQLiteStore(path, table="page_summaries")
+
+    @staticmethod
+    def key(doc_hash, page, model, prompt):
+        return f"{doc_hash}:{page}:{text_hash(model + chr(0) + prompt)[:16]}"
+
+    def get_many(self, doc_hash, pages, model, prompt):
+        """Return {page: summary} for the pages already summarized"""
+        keys = {self.key(doc_hash, page, model, prompt): page for page in pages}
+        return {keys[key]: value.decode("utf-8") for key, value in self.store.get_many(keys).items()}
+
+    def put_many(self, doc_hash, summaries, model, prompt):
+        self.store.put_many(
+            (self.key(doc_hash, page, model, prompt), summary.encode("utf-8"))
+            for page, summary in summaries.items()
+        )
+
+    def close(self):
+        self.store.close()
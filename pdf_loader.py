@@ -0,0 +1,155 @@
+import os
+import atexit
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents import Document
+
+EXTRACT_WORKERS = int(os.getenv("RAG_EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
+# Below this many pages, starting work in other processes costs more than it saves
+PARALLEL_MIN_PAGES = int(os.getenv("RAG_PARALLEL_MIN_PAGES", "48"))
+# Shards per worker, so that a few slow pages don't leave the other workers idle
+SHARDS_PER_WORKER = 4
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def file_sha256(file_path):
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def document_metadata(doc, file_path):
+    """Document-level metadata, with the same keys PyMuPDFLoader puts on every page"""
+    metadata = {
+        "producer": "PyMuPDF",
+        "creator": "PyMuPDF",
+        "creationdate": "",
+        "source": file_path,
+        "file_path": file_path,
+        "total_pages": len(doc),
+    }
+    for k, v in doc.metadata.items():
+        if isinstance(v, (str, int)):
+            metadata[k.lower()] = v.strip() if isinstance(v, str) else v
+    for k in ("modDate", "creationDate"):
+        if k in doc.metadata:
+            metadata[k] = doc.metadata[k]
+    return metadata
+
+
+def _fitz():
+    # PyMuPDF is imported on first use: it adds a noticeable delay to every startup otherwise
+    import fitz
+    return fitz
+
+
+def page_count(file_path):
+    with _fitz().open(file_path) as doc:
+        return len(doc)
+
+
+def check_pdf(file_path):
+    """Raise ValueError unless file_path is a PDF with at least one page, whatever its extension"""
+    try:
+        with _fitz().open(file_path, filetype="pdf") as doc:
+            pages = len(doc)
+    except Exception as e:
+        raise ValueError("not a readable PDF") from e
+    if not pages:
+        raise ValueError("the PDF has no pages")
+
+
+def render_page(file_path, page_num, dpi=100):
+    """PNG image of a page"""
+    with _fitz().open(file_path) as doc:
+        return doc[page_num].get_pixmap(dpi=dpi).tobytes("png")
+
+
+def iter_pages(file_path):
+    """Lazily yield one Document per page, only holding the current page's text in memory"""
+    with _fitz().open(file_path) as doc:
+        metadata = document_metadata(doc, file_path)
+        for page_num in range(len(doc)):
+            text = doc[page_num].get_text().strip()
+            yield Document(page_content=text, metadata={**metadata, "page": page_num})
+
+
+def iter_windows(items, size):
+    """Group an iterable into lists of at most size items"""
+    window = []
+    for item in items:
+        window.append(item)
+        if len(window) >= size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def _extract_texts(file_path, page_numbers):
+    """Worker: open a private fitz handle and return the text of the given pages"""
+    with _fitz().open(file_path) as doc:
+        return [doc[page_num].get_text().strip() for page_num in page_numbers]
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: forking a process that already runs threads (Streamlit, servers) is unsafe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+@atexit.register
+def _shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_page_texts(file_path, page_numbers=None, workers=None):
+    """Return {page_num: text} for the requested pages (all pages by default).
+
+    Page ranges are sharded across a process pool, each worker opening its own fitz
+    handle. Small requests are extracted in-process. Out-of-range pages are skipped.
+    """
+    workers = workers or EXTRACT_WORKERS
+    with _fitz().open(file_path) as doc:
+        page_count = len(doc)
+        if page_numbers is None:
+            page_numbers = range(page_count)
+        page_numbers = [p for p in page_numbers if 0 <= p < page_count]
+        if workers <= 1 or len(page_numbers) < PARALLEL_MIN_PAGES:
+            return {p: doc[p].get_text().strip() for p in page_numbers}
+
+    shard_size = max(1, -(-len(page_numbers) // (workers * SHARDS_PER_WORKER)))
+    shards = [page_numbers[i:i + shard_size] for i in range(0, len(page_numbers), shard_size)]
+    pool = _get_pool(workers)
+    futures = [pool.submit(_extract_texts, file_path, shard) for shard in shards]
+    texts = {}
+    for shard, future in zip(shards, futures):
+        texts.update(zip(shard, future.result()))
+    return texts
+
+
+def load_pages(file_path, workers=None):
+    """Load every page as a Document, in order, with PyMuPDFLoader's metadata"""
+    with _fitz().open(file_path) as doc:
+        metadata = document_metadata(doc, file_path)
+    texts = extract_page_texts(file_path, workers=workers)
+    return [
+        Document(page_content=texts[page_num], metadata={**metadata, "page": page_num})
+        for page_num in sorted(texts)
+    ]
@@ -0,0 +1,48 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf_loader import render_page
+
+# Page images kept in memory, least recently used dropped first
+PREVIEW_CACHE_PAGES = int(os.getenv("RAG_PREVIEW_CACHE_PAGES", "64"))
+PREVIEW_DPI = int(os.getenv("RAG_PREVIEW_DPI", "100"))
+PREVIEW_WORKERS = 2
+
+
+class PagePreviews:
+    """PNG images of PDF pages, rendered in background threads and cached per page.
+
+    Pages are identified by file path: uploads are stored under their content hash, so a
+    path always holds the same document. A page that failed to render is tried again
+    on the next request.
+    """
+
+    def __init__(self, max_pages=PREVIEW_CACHE_PAGES, dpi=PREVIEW_DPI, workers=PREVIEW_WORKERS):
+        self.max_pages = max_pages
+        self.dpi = dpi
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preview")
+        self.images = OrderedDict()  # (file path, page) -> Future of the PNG bytes
+        self._lock = threading.Lock()
+
+    def prefetch(self, file_path, page_num):
+        """Start rendering a page unless it is cached or on its way. Returns the Future of its PNG bytes"""
+        key = (file_path, page_num)
+        with self._lock:
+            future = self.images.get(key)
+            if future is None or (future.done() and future.exception() is not None):
+                future = self.executor.submit(render_page, file_path, page_num, self.dpi)
+                self.images[key] = future
+            self.images.move_to_end(key)
+            while len(self.images) > self.max_pages:
+                self.images.popitem(last=False)
+        return future
+
+    def get(self, file_path, page_num, timeout=None):
+        """PNG bytes of a page, rendered now if needed"""
+        return self.prefetch(file_path, page_num).result(timeout)
+
+
+# Shared by every session of the process
+previews = PagePreviews()
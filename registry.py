@@ -0,0 +1,106 @@
+import atexit
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Per-document indexes kept open at the same time; the least recently used are released
+MAX_OPEN_INDEXES = 32
+
+
+class ResourceRegistry:
+    """Process-wide home of long-lived resources: LLM and embedding clients, caches,
+    chains and per-document vector indexes.
+
+    Streamlit re-executes the UI script on every interaction and may serve several
+    sessions from one process; fetching resources from here instead of building them
+    keeps warm state across reruns and shares one client per model between users.
+    """
+
+    def __init__(self, max_indexes=MAX_OPEN_INDEXES):
+        self.max_indexes = max_indexes
+        self._lock = threading.RLock()
+        self._resources = OrderedDict()
+        self._key_locks = {}
+        self._build_locks = {}
+
+    def get(self, kind, key, factory):
+        """Return the resource registered under (kind, key), creating it with factory() if needed.
+
+        factory() runs outside the registry lock: a slow build only makes the callers of
+        the same (kind, key) wait, and it may itself get other resources.
+        """
+        entry = (kind, key)
+        with self._lock:
+            if entry in self._resources:
+                self._resources.move_to_end(entry)
+                return self._resources[entry]
+        # Not the lock() of (kind, key): callers may hold that one while getting the resource
+        with self._hold(self._build_locks, entry):
+            with self._lock:
+                if entry in self._resources:
+                    self._resources.move_to_end(entry)
+                    return self._resources[entry]
+            resource = factory()
+            with self._lock:
+                self._put(entry, resource)
+            return resource
+
+    def put(self, kind, key, resource):
+        """Register (or replace) a resource built by the caller"""
+        with self._lock:
+            self._put((kind, key), resource)
+
+    def _put(self, entry, resource):
+        self._resources[entry] = resource
+        self._resources.move_to_end(entry)
+        indexes = [e for e in self._resources if e[0] == "index"]
+        for stale in indexes[:max(0, len(indexes) - self.max_indexes)]:
+            # Resources built on the index (keyword index, chains...) go with it
+            for dependent in [e for e in self._resources if self._depends_on(e, stale[1])]:
+                self._release(dependent)
+
+    @staticmethod
+    def _depends_on(entry, index_key):
+        key = entry[1]
+        return key == index_key or (isinstance(key, tuple) and key and key[0] == index_key)
+
+    def discard(self, kind, key):
+        """Forget a resource, e.g. after its index was deleted"""
+        with self._lock:
+            self._release((kind, key))
+
+    def _release(self, entry):
+        resource = self._resources.pop(entry, None)
+        if hasattr(resource, "close"):
+            resource.close()
+
+    def lock(self, kind, key):
+        """Context manager holding a lock dedicated to (kind, key), to serialize building
+        a resource across sessions"""
+        return self._hold(self._key_locks, (kind, key))
+
+    @contextmanager
+    def _hold(self, locks, entry):
+        # Locks are counted by holders and waiters, and forgotten once the last one leaves,
+        # so that the tables don't keep an entry for every key ever built
+        with self._lock:
+            held = locks.setdefault(entry, [threading.Lock(), 0])
+            held[1] += 1
+        try:
+            with held[0]:
+                yield
+        finally:
+            with self._lock:
+                held[1] -= 1
+                if not held[1]:
+                    del locks[entry]
+
+    def close(self):
+        """Release every resource (called at interpreter exit)"""
+        with self._lock:
+            for entry in list(self._resources):
+                self._release(entry)
+
+
+resources = ResourceRegistry()
+atexit.register(resources.close)
@@ -0,0 +1,213 @@
+import os
+import heapq
+import asyncio
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager, asynccontextmanager
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable
+from prometheus_client import Counter, Gauge
+
+# Priority classes: lower runs first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Calls running at the same time against one model (match OLLAMA_NUM_PARALLEL)
+MODEL_CONCURRENCY = int(os.getenv("RAG_MODEL_CONCURRENCY", "4"))
+# Slots per model that batch work may never take, so a question never waits for a whole batch
+INTERACTIVE_RESERVE = int(os.getenv("RAG_INTERACTIVE_RESERVE", "1"))
+
+QUEUE_DEPTH = Gauge("rag_scheduler_queue_depth", "Model calls waiting for a slot", ["model", "priority"])
+IN_FLIGHT = Gauge("rag_scheduler_in_flight", "Model calls running", ["model", "priority"])
+GENERATED_TOKENS = Counter("rag_generated_tokens_total", "Tokens generated by a chat model", ["model"])
+
+_priority = contextvars.ContextVar("rag_priority", default=INTERACTIVE)
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextmanager
+def priority(level):
+    """Run the model calls made in this block (and the threads it starts via LangChain) at level"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class PrioritySemaphore:
+    """Semaphore granting free slots to the highest priority waiter first (FIFO within a class).
+
+    Batch callers may hold at most limit - reserve slots at once.
+    """
+
+    def __init__(self, limit, reserve=0, name=""):
+        self.limit = max(1, limit)
+        self.batch_limit = max(1, self.limit - reserve)
+        self.name = name
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._running = {INTERACTIVE: 0, BATCH: 0}
+
+    def _can_run(self, entry):
+        level = entry[0]
+        if self._waiting[0] != entry or sum(self._running.values()) >= self.limit:
+            return False
+        return level == INTERACTIVE or self._running[BATCH] < self.batch_limit
+
+    def acquire(self, level=INTERACTIVE):
+        entry = (level, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            QUEUE_DEPTH.labels(self.name, PRIORITY_NAMES[level]).inc()
+            self._cond.wait_for(lambda: self._can_run(entry))
+            heapq.heappop(self._waiting)
+            self._running[level] += 1
+            QUEUE_DEPTH.labels(self.name, PRIORITY_NAMES[level]).dec()
+            IN_FLIGHT.labels(self.name, PRIORITY_NAMES[level]).inc()
+            # The next waiter may be able to run too (e.g. an interactive one behind a capped batch one)
+            self._cond.notify_all()
+
+    def release(self, level=INTERACTIVE):
+        with self._cond:
+            self._running[level] -= 1
+            IN_FLIGHT.labels(self.name, PRIORITY_NAMES[level]).dec()
+            self._cond.notify_all()
+
+    async def acquire_async(self, level=INTERACTIVE):
+        future = asyncio.get_running_loop().run_in_executor(None, self.acquire, level)
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The waiting thread still gets the slot: hand it back when it does
+            future.add_done_callback(lambda _: self.release(level))
+            raise
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._waiting)
+
+
+class Scheduler:
+    """Entry point of every LLM and embedding call: one PrioritySemaphore per model"""
+
+    def __init__(self, concurrency=MODEL_CONCURRENCY, reserve=INTERACTIVE_RESERVE):
+        self.concurrency = concurrency
+        self.reserve = reserve
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def semaphore(self, model):
+        with self._lock:
+            if model not in self._semaphores:
+                self._semaphores[model] = PrioritySemaphore(self.concurrency, self.reserve, name=model)
+            return self._semaphores[model]
+
+    @contextmanager
+    def slot(self, model):
+        level = current_priority()
+        semaphore = self.semaphore(model)
+        semaphore.acquire(level)
+        try:
+            yield
+        finally:
+            semaphore.release(level)
+
+    @asynccontextmanager
+    async def aslot(self, model):
+        level = current_priority()
+        semaphore = self.semaphore(model)
+        await semaphore.acquire_async(level)
+        try:
+            yield
+        finally:
+            semaphore.release(level)
+
+    def queue_depth(self):
+        """Calls waiting, per model"""
+        with self._lock:
+            semaphores = dict(self._semaphores)
+        return {model: semaphore.queue_depth() for model, semaphore in semaphores.items()}
+
+
+scheduler = Scheduler()
+
+
+def _count_tokens(model, message):
+    # Ollama reports the generated tokens on the last message (or chunk) of an answer
+    tokens = (getattr(message, "response_metadata", None) or {}).get("eval_count")
+    if tokens:
+        GENERATED_TOKENS.labels(model).inc(tokens)
+
+
+class ScheduledRunnable(Runnable):
+    """Runs a chat model (or any runnable) through the scheduler.
+
+    A streamed call holds its slot until the stream ends or is closed. Generated tokens
+    are counted in rag_generated_tokens_total.
+    """
+
+    def __init__(self, bound, model, scheduler=scheduler):
+        self.bound = bound
+        self.model = model
+        self.scheduler = scheduler
+
+    @property
+    def InputType(self):
+        return self.bound.InputType
+
+    @property
+    def OutputType(self):
+        return self.bound.OutputType
+
+    def invoke(self, input, config=None, **kwargs):
+        with self.scheduler.slot(self.model):
+            message = self.bound.invoke(input, config, **kwargs)
+        _count_tokens(self.model, message)
+        return message
+
+    def stream(self, input, config=None, **kwargs):
+        with self.scheduler.slot(self.model):
+            for chunk in self.bound.stream(input, config, **kwargs):
+                _count_tokens(self.model, chunk)
+                yield chunk
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        async with self.scheduler.aslot(self.model):
+            message = await self.bound.ainvoke(input, config, **kwargs)
+        _count_tokens(self.model, message)
+        return message
+
+    async def astream(self, input, config=None, **kwargs):
+        async with self.scheduler.aslot(self.model):
+            async for chunk in self.bound.astream(input, config, **kwargs):
+                _count_tokens(self.model, chunk)
+                yield chunk
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Embedding model calls through the scheduler.
+
+    Document batches come from CachedBatchEmbeddings; each question takes a slot of its
+    own, so concurrent questions are embedded in parallel, up to the model's concurrency.
+    """
+
+    def __init__(self, base, model, scheduler=scheduler):
+        self.base = base
+        self.model = model
+        self.scheduler = scheduler
+
+    def embed_documents(self, texts):
+        with self.scheduler.slot(self.model):
+            return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        with self.scheduler.slot(self.model):
+            return self.base.embed_query(text)
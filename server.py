@@ -0,0 +1,265 @@
+"""Asynchronous HTTP API around LocalRAGApp.
+
+Endpoints:
+    POST /documents                 upload a PDF (multipart field "file" or raw application/pdf body)
+    POST /query                     {"doc_id", "question"} -> server-sent events: sources, token..., done
+    POST /summaries                 {"doc_id", "hierarchical"?} -> queues a background section summary job
+    GET  /summaries/{job_id}        job status and progress (with ETA), and the summary once done
+    DELETE /summaries/{job_id}      cancel the job
+    GET  /health
+
+Usage: python server.py [--host 0.0.0.0] [--port 8080]
+"""
+import os
+import re
+import json
+import uuid
+import asyncio
+import argparse
+
+from aiohttp import web
+
+from app import SUMMARY_DIR, UPLOAD_DIR, LocalRAGApp
+from jobs import DONE, jobs
+from metrics import start_metrics_server
+from pdf_loader import check_pdf, file_sha256
+from scheduler import BATCH, priority
+
+# Requests handled at once; beyond that clients get 429 instead of piling up
+MAX_CONCURRENT_REQUESTS = int(os.getenv("RAG_API_MAX_REQUESTS", "32"))
+# Concurrent work sent to Ollama (generations, ingestion); the rest waits in line
+MAX_OLLAMA_CONCURRENCY = int(os.getenv("RAG_API_OLLAMA_CONCURRENCY", "4"))
+# How long a request may wait for an Ollama slot before getting 503
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("RAG_API_QUEUE_TIMEOUT", "30"))
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+# Documents are named by the SHA-256 of their content: anything else is not a document of ours
+DOC_ID_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+async def _json_body(request):
+    """The request's JSON object, or 400"""
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="Body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Body must be a JSON object")
+    return body
+
+
+def _doc_id(body):
+    doc_id = body.get("doc_id")
+    if not isinstance(doc_id, str) or not DOC_ID_RE.fullmatch(doc_id):
+        raise web.HTTPBadRequest(text='"doc_id" must be the id returned by POST /documents')
+    return doc_id
+
+
+def _source(doc):
+    page = doc.metadata.get("page")
+    return {
+        "page": page + 1 if isinstance(page, int) else None,
+        "source": doc.metadata.get("source"),
+        "excerpt": doc.page_content[:200],
+    }
+
+
+class RAGService:
+    def __init__(self):
+        self.apps = {}  # doc_id -> LocalRAGApp with its retrieval chain ready
+        self.summary_jobs = {}  # job_id -> (doc_id, output_path) of the summaries started here
+        self.requests = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self.ollama = asyncio.Semaphore(MAX_OLLAMA_CONCURRENCY)
+        self._app_locks = {}
+
+    def _file_path(self, doc_id):
+        return os.path.join(UPLOAD_DIR, f"{doc_id}.pdf")
+
+    async def _ollama_slot(self):
+        """Wait for a free Ollama slot, or fail fast with 503 so the load balancer can retry elsewhere"""
+        try:
+            await asyncio.wait_for(self.ollama.acquire(), OLLAMA_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise web.HTTPServiceUnavailable(
+                text="Model is busy, retry later", headers={"Retry-After": str(int(OLLAMA_QUEUE_TIMEOUT))}
+            )
+
+    async def _get_app(self, doc_id):
+        """App for an uploaded document, (re)opening its index after a restart"""
+        if doc_id in self.apps:
+            return self.apps[doc_id]
+        if not isinstance(doc_id, str) or not DOC_ID_RE.fullmatch(doc_id):
+            raise web.HTTPNotFound(text="Unknown document")
+        file_path = self._file_path(doc_id)
+        if not os.path.exists(file_path):
+            raise web.HTTPNotFound(text=f"Unknown document {doc_id}")
+        lock = self._app_locks.setdefault(doc_id, asyncio.Lock())
+        async with lock:
+            if doc_id not in self.apps:
+                await self._ollama_slot()
+                try:
+                    rag = LocalRAGApp()
+
+                    def ingest():
+                        # Batch priority: queries on documents already loaded go first
+                        with priority(BATCH):
+                            rag.ingest_document(file_path)
+
+                    await asyncio.to_thread(ingest)
+                    await asyncio.to_thread(rag.setup_retrieval_chain)
+                finally:
+                    self.ollama.release()
+                self.apps[doc_id] = rag
+        return self.apps[doc_id]
+
+    @web.middleware
+    async def limit_requests(self, request, handler):
+        if request.path == "/health":
+            return await handler(request)
+        if self.requests.locked():
+            raise web.HTTPTooManyRequests(text="Too many concurrent requests")
+        async with self.requests:
+            return await handler(request)
+
+    async def health(self, request):
+        return web.json_response({"status": "ok", "documents": len(self.apps)})
+
+    async def ingest(self, request):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        tmp_path = os.path.join(UPLOAD_DIR, f"upload-{uuid.uuid4().hex}.part")
+        if request.content_type.startswith("multipart/"):
+            reader = await request.multipart()
+            part = await reader.next()
+            while part is not None and part.name != "file":
+                part = await reader.next()
+            if part is None:
+                raise web.HTTPBadRequest(text='Missing multipart field "file"')
+            read_block = part.read_chunk
+        else:
+            read_block = request.content.read
+        # Stream to disk: large PDFs never sit whole in memory
+        with open(tmp_path, "wb") as f:
+            while True:
+                block = await read_block(UPLOAD_BLOCK_SIZE)
+                if not block:
+                    break
+                f.write(block)
+
+        try:
+            await asyncio.to_thread(check_pdf, tmp_path)
+        except ValueError as e:
+            os.remove(tmp_path)
+            raise web.HTTPBadRequest(text=f"Upload rejected: {e}")
+        doc_id = await asyncio.to_thread(file_sha256, tmp_path)
+        os.replace(tmp_path, self._file_path(doc_id))
+        await self._get_app(doc_id)
+        return web.json_response({"doc_id": doc_id}, status=201)
+
+    async def query(self, request):
+        body = await _json_body(request)
+        doc_id = _doc_id(body)
+        question = body.get("question")
+        question = question.strip() if isinstance(question, str) else ""
+        if not question:
+            raise web.HTTPBadRequest(text='Missing "question"')
+        rag = await self._get_app(doc_id)
+
+        await self._ollama_slot()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        stream = rag.astream_answer(question)
+        stats = {}
+        try:
+            await response.prepare(request)
+            async for chunk in stream:
+                if "context" in chunk:
+                    await response.write(_sse("sources", [_source(doc) for doc in chunk["context"]]))
+                if "answer" in chunk:
+                    await response.write(_sse("token", chunk["answer"]))
+                # This request's own stats: other queries on the document run concurrently
+                stats = chunk.get("stats", stats)
+            await response.write(_sse("done", stats))
+        except (ConnectionResetError, asyncio.CancelledError):
+            # Client went away: stop generating instead of finishing an answer nobody reads
+            print("Client disconnected, generation cancelled.")
+            raise
+        finally:
+            await stream.aclose()
+            self.ollama.release()
+        return response
+
+    async def start_summary(self, request):
+        body = await _json_body(request)
+        doc_id = _doc_id(body)
+        rag = await self._get_app(doc_id)
+        file_path = self._file_path(doc_id)
+        os.makedirs(SUMMARY_DIR, exist_ok=True)
+        output_path = os.path.join(SUMMARY_DIR, f"{doc_id}-{uuid.uuid4().hex}.txt")
+        hierarchical = bool(body.get("hierarchical"))
+
+        def summarize(job):
+            # Runs in the job pool, which bounds the summaries in progress
+            if hierarchical:
+                rag.summarize_hierarchy(file_path, output_path=output_path, on_progress=job.progress)
+            else:
+                rag.summarize_sections(rag.load_document(file_path), output_path=output_path, on_progress=job.progress)
+            return output_path
+
+        job = jobs.submit("summary", doc_id, summarize, unit="steps" if hierarchical else "chunks")
+        self.summary_jobs[job.id] = (doc_id, output_path)
+        return web.json_response(self._job_status(job), status=202)
+
+    def _summary_job(self, request):
+        job_id = request.match_info["job_id"]
+        if job_id not in self.summary_jobs or jobs.get(job_id) is None:
+            raise web.HTTPNotFound(text="Unknown job")
+        return jobs.get(job_id)
+
+    def _job_status(self, job):
+        doc_id, output_path = self.summary_jobs[job.id]
+        return {**job.to_dict(), "doc_id": doc_id, "output_path": output_path if job.status == DONE else None}
+
+    async def get_summary(self, request):
+        job = self._summary_job(request)
+        result = self._job_status(job)
+        if job.status == DONE:
+            with open(job.result, "r", encoding="utf-8") as f:
+                result["summary"] = f.read()
+        return web.json_response(result)
+
+    async def cancel_summary(self, request):
+        job = self._summary_job(request)
+        jobs.cancel(job.id)
+        return web.json_response(self._job_status(job), status=202)
+
+
+def create_app():
+    service = RAGService()
+    api = web.Application(middlewares=[service.limit_requests], client_max_size=512 * 1024 * 1024)
+    api.add_routes([
+        web.get("/health", service.health),
+        web.post("/documents", service.ingest),
+        web.post("/query", service.query),
+        web.post("/summaries", service.start_summary),
+        web.get("/summaries/{job_id}", service.get_summary),
+        web.delete("/summaries/{job_id}", service.cancel_summary),
+    ])
+    return api
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local RAG HTTP API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("RAG_API_PORT", "8080")))
+    args = parser.parse_args(argv)
+    start_metrics_server()
+    # Models load in the background while the server already accepts requests
+    LocalRAGApp().start_warm_up()
+    # handler_cancellation: a disconnected client cancels its handler, hence its generation
+    web.run_app(create_app(), host=args.host, port=args.port, handler_cancellation=True)
+
+
+if __name__ == "__main__":
+    main()
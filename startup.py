@@ -0,0 +1,137 @@
+"""Cold start: startup time breakdown, background imports and model warm-up.
+
+The UI, the HTTP API and the command line import what they need when they need it;
+warm_up() then imports the rest and asks Ollama to load the chat and embedding models
+in a background thread, so the first upload and the first question don't pay for it.
+
+Usage: python startup.py [--wait 60]   # load the models into Ollama and print the timings
+"""
+import os
+import json
+import time
+import argparse
+import importlib
+import threading
+import urllib.request
+from contextlib import contextmanager
+
+import metrics
+
+# Ask Ollama to load the models when the app starts (0: on the first request)
+WARM_UP = os.getenv("RAG_WARM_UP", "1") == "1"
+# How long Ollama keeps the models loaded after their last request
+OLLAMA_KEEP_ALIVE = os.getenv("RAG_OLLAMA_KEEP_ALIVE", "30m")
+# Imported on first use by the app; the warm-up imports them ahead of time
+DEFERRED_IMPORTS = (
+    "langchain_community.embeddings.ollama",
+    "langchain_community.chat_models.ollama",
+    "langchain_community.vectorstores.chroma",
+    "chromadb",
+    "fitz",
+)
+
+
+class StartupTimer:
+    """Named startup steps and how long they took, in the order they finished"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps = []  # (name, seconds)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.steps.append((name, seconds))
+            metrics.STARTUP_SECONDS.labels(name).set(seconds)
+
+    def report(self):
+        with self._lock:
+            steps = list(self.steps)
+        lines = [f"  {name:<50} {seconds:7.2f}s" for name, seconds in steps]
+        lines.append(f"  {'ready after':<50} {time.perf_counter() - self.started:7.2f}s")
+        return "Startup timings:\n" + "\n".join(lines)
+
+
+# Shared by every entry point of the process
+timer = StartupTimer()
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+
+
+def _post(url, payload, timeout):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+
+
+def wait_for_ollama(base_url, timeout):
+    """Wait until Ollama answers (e.g. right after `ollama serve` in the container). Returns True if it does"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/version", timeout=2) as response:
+                response.read()
+            return True
+        except OSError:
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.5)
+
+
+def warm_models(base_url, chat_model, embedding_model, timeout=600):
+    """Load both models into Ollama and keep them resident for OLLAMA_KEEP_ALIVE"""
+    with timer.step(f"load {embedding_model}"):
+        _post(f"{base_url}/api/embed", {"model": embedding_model, "input": "warm-up", "keep_alive": OLLAMA_KEEP_ALIVE}, timeout)
+    with timer.step(f"load {chat_model}"):
+        # A request without a prompt only loads the model
+        _post(f"{base_url}/api/generate", {"model": chat_model, "keep_alive": OLLAMA_KEEP_ALIVE}, timeout)
+
+
+def warm_up(base_url, chat_model, embedding_model, models=WARM_UP):
+    """Import the deferred modules, then (with models) load the models; prints the timings"""
+    for module in DEFERRED_IMPORTS:
+        with timer.step(f"import {module}"):
+            importlib.import_module(module)
+    if models:
+        try:
+            warm_models(base_url, chat_model, embedding_model)
+        except OSError as e:
+            print(f"⚠️ Could not warm up the models: {e}")
+    print(timer.report())
+
+
+def start_warm_up(base_url, chat_model, embedding_model, models=WARM_UP):
+    """Run warm_up() in a background thread, once per process. Safe to call on every Streamlit rerun"""
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(
+                target=warm_up, args=(base_url, chat_model, embedding_model, models), name="warm-up", daemon=True,
+            )
+            _warm_up_thread.start()
+        return _warm_up_thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the Ollama models and print the startup timings")
+    parser.add_argument("--wait", type=float, default=0, help="seconds to wait for Ollama to start")
+    args = parser.parse_args(argv)
+
+    with timer.step("import app"):
+        from app import OLLAMA_BASE_URL, LocalRAGApp
+    rag = LocalRAGApp()
+    if args.wait and not wait_for_ollama(OLLAMA_BASE_URL, args.wait):
+        print(f"⚠️ Ollama did not answer on {OLLAMA_BASE_URL} within {args.wait:.0f}s")
+    warm_up(OLLAMA_BASE_URL, rag.local_model, rag.embedding_model, models=True)
+
+
+if __name__ == "__main__":
+    main()
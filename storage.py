@@ -0,0 +1,105 @@
+import os
+import time
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """Small persistent key/value store backed by a single SQLite file.
+
+    Used by the on-disk caches (embeddings, summaries...). Safe to share
+    between threads of one process; several processes may open the same file.
+    With max_entries set, the store is bounded and evicts the least recently
+    used entries first.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    _MAX_VARIABLES = 500
+
+    def __init__(self, path, table="entries", max_entries=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+        if "last_used" not in columns:
+            # Stores created before LRU eviction existed
+            self._conn.execute(f"ALTER TABLE {table} ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the value stored under key, or None"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Return a dict with the values of the keys that are present"""
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), self._MAX_VARIABLES):
+                batch = keys[start:start + self._MAX_VARIABLES]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})", batch
+                )
+                found.update(rows)
+            if found and self.max_entries:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put(self, key, value):
+        """Store a single value"""
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        """Store (key, value) pairs, replacing existing values"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, last_used) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items],
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def delete_many(self, keys):
+        """Remove the given keys if present"""
+        keys = list(keys)
+        with self._lock:
+            for start in range(0, len(keys), self._MAX_VARIABLES):
+                batch = keys[start:start + self._MAX_VARIABLES]
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key IN ({placeholders})", batch)
+            self._conn.commit()
+
+    def items(self):
+        """All (key, value) pairs, ordered by key"""
+        with self._lock:
+            return self._conn.execute(f"SELECT key, value FROM {self.table} ORDER BY key").fetchall()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
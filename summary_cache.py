@@ -0,0 +1,35 @@
+import os
+import hashlib
+
+from storage import SQLiteStore
+
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("RAG_SUMMARY_CACHE_SIZE", "20000"))
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """Persistent, size-bounded LRU cache of LLM summaries.
+
+    Entries are keyed by (text hash, model, prompt template hash), so changing
+    the model or the prompt never serves a stale summary.
+    """
+
+    def __init__(self, path, max_entries=SUMMARY_CACHE_MAX_ENTRIES):
+        self.store = SQLiteStore(path, table="summaries", max_entries=max_entries)
+
+    @staticmethod
+    def key(text, model, prompt):
+        return text_hash("\0".join([text_hash(text), model, text_hash(prompt)]))
+
+    def get_many(self, keys):
+        """Return {key: summary} for the keys already summarized"""
+        return {key: value.decode("utf-8") for key, value in self.store.get_many(keys).items()}
+
+    def put(self, key, summary):
+        self.store.put(key, summary.encode("utf-8"))
+
+    def close(self):
+        self.store.close()
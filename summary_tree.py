@@ -0,0 +1,119 @@
+import os
+
+# Without an outline, pages are grouped in sections of this many pages
+SECTION_PAGES = int(os.getenv("RAG_SUMMARY_SECTION_PAGES", "10"))
+# Merged summaries longer than this are first merged in smaller groups (the chat model has a small context)
+MERGE_MAX_CHARS = int(os.getenv("RAG_SUMMARY_MERGE_CHARS", "6000"))
+
+
+class SectionNode:
+    """A part of the document covering pages [start, end), possibly with sub-sections.
+
+    The pages before the first sub-section (or all of them, for a leaf) are the
+    section's own pages: their chunks are summarized directly.
+    """
+
+    def __init__(self, title, level, start, end):
+        self.title = title
+        self.level = level
+        self.start = start
+        self.end = end
+        self.children = []
+        self.own_pages = []
+        self.summary = ""
+
+    @property
+    def own_end(self):
+        return self.children[0].start if self.children else self.end
+
+    def walk(self):
+        """This node and its descendants, parents first"""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    @property
+    def height(self):
+        return 1 + max((child.height for child in self.children), default=0)
+
+
+def _page_sections(start, end, level, section_pages=SECTION_PAGES):
+    return [
+        SectionNode(f"Pages {first + 1}-{min(first + section_pages, end)}", level, first, min(first + section_pages, end))
+        for first in range(start, end, section_pages)
+    ]
+
+
+def build_outline(file_path, page_numbers=None, section_pages=SECTION_PAGES):
+    """Section tree of a PDF, from its outline (table of contents) when it has one.
+
+    Without a usable outline, the document is cut into sections of section_pages pages.
+    With page_numbers (0-based), the tree is restricted to those pages: sections
+    outside them are dropped and the others keep only the selected pages.
+    """
+    import fitz  # PyMuPDF, imported on first use (slow to import)
+
+    with fitz.open(file_path) as doc:
+        page_count = len(doc)
+        toc = doc.get_toc(simple=True)
+        title = (doc.metadata or {}).get("title") or os.path.basename(file_path)
+
+    root = SectionNode(title, 0, 0, page_count)
+    # Entries pointing nowhere (page < 1) cannot be placed
+    entries = [(level, text.strip() or "Section", page - 1) for level, text, page in toc if 0 < page <= page_count]
+    if entries:
+        stack = [root]
+        for level, text, start in entries:
+            while len(stack) > 1 and stack[-1].level >= level:
+                stack.pop()
+            node = SectionNode(text, level, max(start, stack[-1].start), stack[-1].end)
+            stack[-1].children.append(node)
+            stack.append(node)
+        # A section ends where the next one at the same or a higher level begins
+        for node in root.walk():
+            for current, following in zip(node.children, node.children[1:]):
+                current.end = min(max(current.start, following.start), node.end)
+            if node.children:
+                node.children[-1].end = node.end
+        if root.children and root.children[0].start > 0:
+            root.children.insert(0, SectionNode(f"Pages 1-{root.children[0].start}", 1, 0, root.children[0].start))
+    else:
+        root.children = _page_sections(0, page_count, 1, section_pages)
+
+    selected = set(page_numbers) if page_numbers is not None else None
+    if selected is not None:
+        _restrict(root, selected)
+    for node in root.walk():
+        node.own_pages = [p for p in range(node.start, node.own_end) if selected is None or p in selected]
+    return root
+
+
+def _restrict(node, selected):
+    node.children = [child for child in node.children if selected.intersection(range(child.start, child.end))]
+    for child in node.children:
+        _restrict(child, selected)
+
+
+def merge_groups(texts, max_chars=MERGE_MAX_CHARS):
+    """Split texts into consecutive groups of at most max_chars (a single longer text is its own group)"""
+    groups = []
+    size = 0
+    for text in texts:
+        if groups and size + len(text) <= max_chars:
+            groups[-1].append(text)
+            size += len(text)
+        else:
+            groups.append([text])
+            size = len(text)
+    return groups
+
+
+def render_markdown(root):
+    """The summaries of the tree as a Markdown outline, document first"""
+    parts = []
+    for node in root.walk():
+        if not node.summary.strip():
+            continue
+        heading = "#" * min(node.level + 1, 6)
+        parts.append(f"{heading} {node.title}\n\n{node.summary.strip()}\n")
+    return "\n".join(parts)